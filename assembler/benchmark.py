@@ -0,0 +1,262 @@
+import argparse
+import json
+import pathlib
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from hack_assembler.assembler import (
+    assemble_single_pass,
+    build_symbol_table,
+    collect_labels,
+    encode,
+    iter_assemble,
+)
+from hack_assembler.parser import decode_lines
+from hack_assembler.rom import write_hack, write_hack_stream
+from main import iter_file, read_file
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+FIXTURES = [
+    ROOT / "ch06" / "add" / "Add.asm",
+    ROOT / "ch06" / "max" / "Max.asm",
+    ROOT / "ch06" / "rect" / "Rect.asm",
+    ROOT / "ch06" / "pong" / "Pong.asm",
+]
+
+PHASES = ["read", "preprocess", "label_pass", "encode", "write"]
+
+ROM_SIZE = 32768
+
+C_COMMANDS = [
+    "D=M", "D=A", "M=D", "AM=M-1", "M=M+1", "A=M", "D=D+A", "D=D-A",
+    "M=D+M", "M=M-D", "D=M-D", "A=A+1", "M=-1", "M=0", "0;JMP", "D;JEQ",
+    "D;JGT", "D;JLT", "D;JNE", "MD=M+1", "D=!M", "M=D|M", "M=D&M",
+]
+
+
+# Writes a synthetic program of line_count lines. Every label_every-th line
+# is a label (only within the 32K ROM so label addresses stay encodable),
+# the rest are A- and C-commands in the given ratio. symbol_density is the
+# share of A-commands that use a symbol instead of a constant; symbols are
+# split evenly between labels (forward and backward) and variables.
+def generate_program(
+    file_path: pathlib.Path,
+    line_count: int,
+    a_ratio: float = 0.5,
+    label_every: int = 20,
+    symbol_density: float = 0.5,
+    variables: int = 200,
+    seed: int = 0,
+) -> None:
+    rng = random.Random(seed)
+    label_count = max(1, min(line_count, ROM_SIZE) // label_every)
+
+    with open(file_path, "w") as f:
+        label_index = 0
+        chunk = []
+        for i in range(line_count):
+            if i % label_every == 0 and label_index < label_count:
+                chunk.append(f"(LABEL_{label_index})\n")
+                label_index += 1
+            elif rng.random() < a_ratio:
+                if rng.random() < symbol_density:
+                    if rng.random() < 0.5:
+                        chunk.append(f"@LABEL_{rng.randrange(label_count)}\n")
+                    else:
+                        chunk.append(f"@var_{rng.randrange(variables)}\n")
+                else:
+                    chunk.append(f"@{rng.randrange(ROM_SIZE)}\n")
+            else:
+                chunk.append(rng.choice(C_COMMANDS) + "\n")
+
+            if len(chunk) >= 65536:
+                f.writelines(chunk)
+                chunk = []
+        f.writelines(chunk)
+
+
+def run_phases(input_path: pathlib.Path, output_path: pathlib.Path) -> Dict[str, float]:
+    times = {}
+
+    start = time.perf_counter()
+    lines = read_file(input_path)
+    times["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    instructions = decode_lines(lines)
+    times["preprocess"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    symbol_table = build_symbol_table(instructions)
+    times["label_pass"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    words = encode(instructions, symbol_table)
+    times["encode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_hack(words, output_path)
+    times["write"] = time.perf_counter() - start
+
+    # label pass and encode done in one go, for comparison
+    start = time.perf_counter()
+    single_pass_words = assemble_single_pass(instructions)
+    times["single_pass"] = time.perf_counter() - start
+
+    if single_pass_words != words:
+        raise RuntimeError(f"Single-pass output differs on {input_path}.")
+
+    return times
+
+
+def peak_memory(input_path: pathlib.Path, output_path: pathlib.Path, stream: bool) -> int:
+    tracemalloc.start()
+    try:
+        if stream:
+            labels = collect_labels(iter_file(input_path))
+            write_hack_stream(iter_assemble(iter_file(input_path), labels), output_path)
+        else:
+            instructions = decode_lines(read_file(input_path))
+            words = encode(instructions, build_symbol_table(instructions))
+            write_hack(words, output_path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_case(
+    input_path: pathlib.Path, repeat: int, measure_memory: bool
+) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = pathlib.Path(directory) / "out.hack"
+
+        best: Dict[str, float] = {}
+        for _ in range(repeat):
+            for phase, elapsed in run_phases(input_path, output_path).items():
+                best[phase] = min(best.get(phase, float("inf")), elapsed)
+
+        with open(input_path, "r") as f:
+            line_count = sum(1 for _ in f)
+
+        total = sum(best[phase] for phase in PHASES)
+        return {
+            "lines": line_count,
+            "phases": best,
+            "total": total,
+            "lines_per_sec": line_count / total,
+            "peak_bytes": peak_memory(input_path, output_path, False) if measure_memory else None,
+            "stream_peak_bytes": (
+                peak_memory(input_path, output_path, True) if measure_memory else None
+            ),
+        }
+
+
+def print_results(results: Dict[str, Dict[str, object]]) -> None:
+    print("phase times in ms")
+    header = f"{'case':<18}{'lines':>10}" + "".join(f"{phase:>12}" for phase in PHASES)
+    header += f"{'single_pass':>12}{'total':>10}{'lines/sec':>12}{'peak MB':>9}{'stream MB':>10}"
+    print(header)
+    for name, result in results.items():
+        phases = result["phases"]
+        peak = result["peak_bytes"]
+        stream_peak = result["stream_peak_bytes"]
+        print(
+            f"{name:<18}{result['lines']:>10}"
+            + "".join(f"{phases[phase] * 1000:>12.2f}" for phase in PHASES)
+            + f"{phases['single_pass'] * 1000:>12.2f}"
+            + f"{result['total'] * 1000:>10.1f}"
+            + f"{result['lines_per_sec']:>12,.0f}"
+            + (f"{peak / 2 ** 20:>9.1f}" if peak is not None else f"{'-':>9}")
+            + (f"{stream_peak / 2 ** 20:>10.1f}" if stream_peak is not None else f"{'-':>10}")
+        )
+
+
+# (case, measure, baseline, current) for every measure worse than tolerance
+def find_regressions(
+    results: Dict[str, Dict[str, object]],
+    baseline: Dict[str, Dict[str, object]],
+    tolerance: float,
+) -> List[Tuple[str, str, float, float]]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]
+        for phase in PHASES + ["single_pass"]:
+            old, new = previous["phases"].get(phase), result["phases"][phase]
+            # sub-millisecond phases are too noisy to compare
+            if old is not None and new > 1e-3 and new > old * (1 + tolerance):
+                regressions.append((name, phase, old, new))
+        for measure in ("peak_bytes", "stream_peak_bytes"):
+            old_peak, new_peak = previous.get(measure), result[measure]
+            if old_peak and new_peak and new_peak > old_peak * (1 + tolerance):
+                regressions.append((name, measure, old_peak, new_peak))
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Assembler benchmark suite")
+    arg_parser.add_argument(
+        "inputs", type=pathlib.Path, nargs="*", help="extra .asm files to benchmark"
+    )
+    arg_parser.add_argument(
+        "--sizes",
+        default="10000,100000,1000000",
+        help="comma separated line counts of synthetic programs (up to 10000000)",
+    )
+    arg_parser.add_argument("--a-ratio", type=float, default=0.5)
+    arg_parser.add_argument("--label-every", type=int, default=20)
+    arg_parser.add_argument("--symbol-density", type=float, default=0.5)
+    arg_parser.add_argument("--no-fixtures", action="store_true")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip peak memory runs")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--baseline", type=pathlib.Path, help="JSON results to compare to")
+    arg_parser.add_argument("--save-baseline", type=pathlib.Path, help="write results as JSON")
+    arg_parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="allowed slowdown before failing"
+    )
+    args = arg_parser.parse_args()
+
+    cases: Dict[str, pathlib.Path] = {}
+    if not args.no_fixtures:
+        for fixture in FIXTURES:
+            cases[fixture.stem] = fixture
+    for input_path in args.inputs:
+        cases[input_path.stem] = input_path
+
+    results: Dict[str, Dict[str, object]] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [int(size) for size in args.sizes.split(",") if size]:
+            synthetic_path = pathlib.Path(directory) / f"synthetic_{size}.asm"
+            generate_program(
+                synthetic_path,
+                size,
+                a_ratio=args.a_ratio,
+                label_every=args.label_every,
+                symbol_density=args.symbol_density,
+            )
+            cases[synthetic_path.stem] = synthetic_path
+
+        for name, input_path in cases.items():
+            results[name] = benchmark_case(input_path, args.repeat, not args.no_memory)
+
+    print_results(results)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, measure, old, new in regressions:
+            print(f"REGRESSION {name} {measure}: {old:.6g} -> {new:.6g} ({new / old - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
@@ -0,0 +1 @@
+# lets the tests import hack_assembler the way the CLIs do
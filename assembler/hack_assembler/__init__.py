@@ -0,0 +1,2 @@
+from hack_assembler.assembler import assemble, collect_labels, iter_assemble
+from hack_assembler.symbol_table import SymbolTable
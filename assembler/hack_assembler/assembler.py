@@ -0,0 +1,149 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from hack_assembler.codetmp import encode_c
+from hack_assembler.parser import CommandType, Instruction, decode_lines, iter_instructions
+from hack_assembler.symbol_table import SymbolTable
+
+# assembly text, or any iterable of source lines
+Source = Union[str, Iterable[str]]
+
+VARIABLE_BASE_ADDRESS = 16
+MAX_A_VALUE = 0x7FFF
+
+
+def constant_value(symbol: str) -> int:
+    value = int(symbol)
+    if value > MAX_A_VALUE:
+        raise RuntimeError(f"A-instruction constant out of range: @{symbol}")
+    return value
+
+
+# first pass: labels -> ROM addresses
+def build_symbol_table(instructions: List[Instruction]) -> SymbolTable:
+    symbol_table = SymbolTable()
+
+    rom_index = 0
+    for instruction in instructions:
+        if instruction.command_type == CommandType.L_COMMAND:
+            symbol_table.add_entry(instruction.symbol, rom_index)
+        else:
+            rom_index += 1
+
+    return symbol_table
+
+
+# second pass: symbols missing from the table are allocated as variables
+def encode(instructions: List[Instruction], symbol_table: SymbolTable) -> array:
+    ram_index = VARIABLE_BASE_ADDRESS
+
+    words = array("H")
+    for instruction in instructions:
+        command_type = instruction.command_type
+        if command_type == CommandType.C_COMMAND:
+            words.append(encode_c(instruction.comp, instruction.dest, instruction.jump))
+        elif command_type == CommandType.A_COMMAND:
+            symbol = instruction.symbol
+            if symbol_table.contains(symbol):
+                symbol_int = int(symbol_table.get_address(symbol))
+            elif symbol.isdecimal():
+                symbol_int = constant_value(symbol)
+            else:
+                symbol_table.add_entry(symbol, ram_index)
+                symbol_int = ram_index
+                ram_index += 1
+
+            words.append(symbol_int)
+
+    return words
+
+
+def assemble_two_pass(instructions: List[Instruction]) -> array:
+    return encode(instructions, build_symbol_table(instructions))
+
+
+# Encodes every instruction as soon as it is read. Symbolic A-commands get a
+# placeholder word and are backpatched once all labels have been seen, so a
+# label defined twice resolves to its last definition just like the two-pass
+# path. Whatever is still undefined at that point is a variable.
+def assemble_single_pass(instructions: List[Instruction]) -> array:
+    symbol_table = SymbolTable()
+
+    words = array("H")
+    # (rom index, symbol) of every symbolic A-command
+    unresolved: List[Tuple[int, str]] = []
+
+    for instruction in instructions:
+        command_type = instruction.command_type
+        if command_type == CommandType.C_COMMAND:
+            words.append(encode_c(instruction.comp, instruction.dest, instruction.jump))
+        elif command_type == CommandType.A_COMMAND:
+            symbol = instruction.symbol
+            if symbol.isdecimal():
+                words.append(constant_value(symbol))
+            else:
+                unresolved.append((len(words), symbol))
+                words.append(0)
+        else:
+            symbol_table.add_entry(instruction.symbol, len(words))
+
+    # variables are allocated in order of first reference, like the two-pass path
+    ram_index = VARIABLE_BASE_ADDRESS
+    for rom_index, symbol in unresolved:
+        if not symbol_table.contains(symbol):
+            symbol_table.add_entry(symbol, ram_index)
+            ram_index += 1
+        words[rom_index] = symbol_table.get_address(symbol)
+
+    return words
+
+
+def source_lines(source: Source) -> Iterable[str]:
+    if isinstance(source, str):
+        return source.splitlines()
+    return source
+
+
+def assemble(source: Source) -> array:
+    return assemble_single_pass(decode_lines(source_lines(source)))
+
+
+def collect_labels(source: Source) -> Dict[str, int]:
+    labels: Dict[str, int] = {}
+    rom_index = 0
+    for instruction in iter_instructions(source_lines(source)):
+        if instruction.command_type == CommandType.L_COMMAND:
+            labels[instruction.symbol] = rom_index
+        else:
+            rom_index += 1
+    return labels
+
+
+# Yields words one by one while reading the source lazily. With the labels
+# known up front every symbol resolves on first sight, so nothing is buffered.
+# Without them a label pass runs first, which needs a re-iterable source.
+def iter_assemble(source: Source, labels: Optional[Dict[str, int]] = None) -> Iterator[int]:
+    if labels is None:
+        if iter(source) is source:
+            raise RuntimeError("Streaming a one-shot source needs precollected labels.")
+        labels = collect_labels(source)
+
+    symbol_table = SymbolTable()
+    for symbol, address in labels.items():
+        symbol_table.add_entry(symbol, address)
+
+    ram_index = VARIABLE_BASE_ADDRESS
+    for instruction in iter_instructions(source_lines(source)):
+        command_type = instruction.command_type
+        if command_type == CommandType.C_COMMAND:
+            yield encode_c(instruction.comp, instruction.dest, instruction.jump)
+        elif command_type == CommandType.A_COMMAND:
+            symbol = instruction.symbol
+            if symbol_table.contains(symbol):
+                yield symbol_table.get_address(symbol)
+            elif symbol.isdecimal():
+                yield constant_value(symbol)
+            else:
+                symbol_table.add_entry(symbol, ram_index)
+                yield ram_index
+                ram_index += 1
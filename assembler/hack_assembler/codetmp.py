@@ -81,3 +81,24 @@ def jump(command: str) -> int:
     if command in jump_map.keys():
         return jump_map[command]
     return 0
+
+
+# Pre-shifted fields of a C-instruction word, so encoding one instruction is
+# three dict lookups. Unknown mnemonics encode as 0, like comp/dest/jump above.
+C_PREFIX = 0b111 << 13
+
+comp_bits: Dict[str, int] = {
+    command: C_PREFIX | code << 6 for command, code in {**comp_map1, **comp_map2}.items()
+}
+
+dest_bits: Dict[str, int] = {command: code << 3 for command, code in dest_map.items()}
+
+jump_bits: Dict[str, int] = dict(jump_map)
+
+
+def encode_c(comp_command: str, dest_command: str, jump_command: str) -> int:
+    return (
+        comp_bits.get(comp_command, C_PREFIX)
+        | dest_bits.get(dest_command, 0)
+        | jump_bits.get(jump_command, 0)
+    )
@@ -0,0 +1,79 @@
+import hashlib
+import pathlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from hack_assembler.assembler import VARIABLE_BASE_ADDRESS
+from hack_assembler.object_file import ObjectFile, assemble_object, source_digest
+from hack_assembler.parser import decode_lines
+
+OBJECT_SUFFIX = ".hobj"
+
+
+# Lays the modules out in ROM in the given order, relocates their labels and
+# resolves imports. Symbols no module exports become variables, allocated
+# from RAM[16] in order of first reference, as assembling the concatenated
+# source would do.
+def link(objects: List[ObjectFile]) -> array:
+    bases: List[int] = []
+    symbols: Dict[str, int] = {}
+    rom_index = 0
+    for obj in objects:
+        bases.append(rom_index)
+        for symbol, offset in obj.exports.items():
+            if symbol in symbols:
+                raise RuntimeError(f"Duplicate label across modules: {symbol}")
+            symbols[symbol] = rom_index + offset
+        rom_index += len(obj.code)
+
+    rom = array("H")
+    for obj, base in zip(objects, bases):
+        code = array("H", obj.code)
+        for offset in obj.relocations:
+            code[offset] += base
+        rom.extend(code)
+
+    ram_index = VARIABLE_BASE_ADDRESS
+    for obj, base in zip(objects, bases):
+        for offset, symbol in obj.imports:
+            if symbol not in symbols:
+                symbols[symbol] = ram_index
+                ram_index += 1
+            rom[base + offset] = symbols[symbol]
+
+    return rom
+
+
+# Keeps one object file per assembly module and re-assembles a module only
+# when the digest of its source no longer matches the cached object.
+class ObjectCache:
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    # "Main-<hash of the source path>.hobj", so modules with the same name in
+    # different directories keep separate objects
+    def object_path(self, asm_path: pathlib.Path) -> pathlib.Path:
+        path_hash = hashlib.sha1(str(asm_path.resolve()).encode()).hexdigest()[:16]
+        return self.directory / f"{asm_path.stem}-{path_hash}{OBJECT_SUFFIX}"
+
+    def load(self, asm_path: pathlib.Path) -> Tuple[ObjectFile, bool]:
+        with open(asm_path, "r") as f:
+            text = f.read()
+        digest = source_digest(text)
+
+        object_path = self.object_path(asm_path)
+        cached: Optional[ObjectFile] = None
+        if object_path.exists():
+            cached = ObjectFile.read(object_path)
+        if cached is not None and cached.source_digest == digest:
+            self.hits += 1
+            return cached, True
+
+        obj = assemble_object(decode_lines(text.splitlines()), digest)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        obj.write(object_path)
+        self.misses += 1
+        return obj, False
@@ -0,0 +1,163 @@
+import hashlib
+import struct
+import sys
+from array import array
+from typing import Dict, List, Tuple
+
+from hack_assembler.assembler import constant_value
+from hack_assembler.codetmp import encode_c
+from hack_assembler.parser import CommandType, Instruction
+from hack_assembler.symbol_table import PREDEFINED_SYMBOLS
+
+MAGIC = b"HOBJ"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sH20sIIIII")
+_EXPORT = struct.Struct("<IH")
+_IMPORT = struct.Struct("<HI")
+
+
+# Relocatable output of one assembly module.
+# code: words, with label references relative to the module start and
+#   imported references left as 0
+# relocations: offsets of words holding a module-relative label address
+# exports: every label defined in the module -> module-relative address
+# imports: (offset, symbol) for references to symbols defined elsewhere;
+#   the linker resolves them to another module's label or to a variable
+class ObjectFile:
+
+    def __init__(self, source_digest: bytes = b""):
+        self.source_digest: bytes = source_digest
+        self.code: array = array("H")
+        self.relocations: array = array("H")
+        self.exports: Dict[str, int] = {}
+        self.imports: List[Tuple[int, str]] = []
+
+    def to_bytes(self) -> bytes:
+        names = sorted(set(self.exports) | {symbol for _, symbol in self.imports})
+        name_index = {name: index for index, name in enumerate(names)}
+
+        encoded_names = [name.encode() for name in names]
+        string_table = b"".join(
+            struct.pack("<H", len(name)) + name for name in encoded_names
+        )
+
+        code = array("H", self.code)
+        relocations = array("H", self.relocations)
+        if sys.byteorder == "big":
+            code.byteswap()
+            relocations.byteswap()
+
+        return b"".join(
+            [
+                _HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    self.source_digest.ljust(20, b"\0"),
+                    len(code),
+                    len(relocations),
+                    len(names),
+                    len(self.exports),
+                    len(self.imports),
+                ),
+                code.tobytes(),
+                relocations.tobytes(),
+                string_table,
+                b"".join(
+                    _EXPORT.pack(name_index[name], offset)
+                    for name, offset in self.exports.items()
+                ),
+                b"".join(
+                    _IMPORT.pack(offset, name_index[symbol])
+                    for offset, symbol in self.imports
+                ),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ObjectFile":
+        (
+            magic,
+            version,
+            source_digest,
+            code_count,
+            relocation_count,
+            name_count,
+            export_count,
+            import_count,
+        ) = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError("Not a Hack object file.")
+
+        obj = cls(source_digest)
+        position = _HEADER.size
+        obj.code.frombytes(data[position:position + code_count * 2])
+        position += code_count * 2
+        obj.relocations.frombytes(data[position:position + relocation_count * 2])
+        position += relocation_count * 2
+        if sys.byteorder == "big":
+            obj.code.byteswap()
+            obj.relocations.byteswap()
+
+        names = []
+        for _ in range(name_count):
+            (length,) = struct.unpack_from("<H", data, position)
+            position += 2
+            names.append(data[position:position + length].decode())
+            position += length
+
+        for _ in range(export_count):
+            index, offset = _EXPORT.unpack_from(data, position)
+            position += _EXPORT.size
+            obj.exports[names[index]] = offset
+
+        for _ in range(import_count):
+            offset, index = _IMPORT.unpack_from(data, position)
+            position += _IMPORT.size
+            obj.imports.append((offset, names[index]))
+
+        return obj
+
+    def write(self, file_path) -> None:
+        with open(file_path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def read(cls, file_path) -> "ObjectFile":
+        with open(file_path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def source_digest(text: str) -> bytes:
+    return hashlib.sha1(text.encode()).digest()
+
+
+def assemble_object(instructions: List[Instruction], digest: bytes = b"") -> ObjectFile:
+    obj = ObjectFile(digest)
+
+    rom_index = 0
+    for instruction in instructions:
+        if instruction.command_type == CommandType.L_COMMAND:
+            obj.exports[instruction.symbol] = rom_index
+        else:
+            rom_index += 1
+
+    code = obj.code
+    for instruction in instructions:
+        command_type = instruction.command_type
+        if command_type == CommandType.C_COMMAND:
+            code.append(encode_c(instruction.comp, instruction.dest, instruction.jump))
+        elif command_type == CommandType.A_COMMAND:
+            symbol = instruction.symbol
+            if symbol in obj.exports:
+                obj.relocations.append(len(code))
+                code.append(obj.exports[symbol])
+            elif symbol in PREDEFINED_SYMBOLS:
+                code.append(PREDEFINED_SYMBOLS[symbol])
+            elif symbol.isdecimal():
+                code.append(constant_value(symbol))
+            else:
+                obj.imports.append((len(code), symbol))
+                code.append(0)
+
+    return obj
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List
+from typing import Iterable, Iterator, List, Optional
 
 
 class CommandType(Enum):
@@ -8,12 +8,90 @@ class CommandType(Enum):
     L_COMMAND = 3,
 
 
+# Decoded form of one source line. Every line is classified and split exactly
+# once; the assembler passes and other tools work on these records instead of
+# re-parsing strings.
+class Instruction:
+    __slots__ = ("command_type", "symbol", "dest", "comp", "jump", "line_number")
+
+    def __init__(
+        self,
+        command_type: CommandType,
+        symbol: str = "",
+        dest: str = "",
+        comp: str = "",
+        jump: str = "",
+        line_number: int = 0,
+    ):
+        self.command_type = command_type
+        self.symbol = symbol
+        self.dest = dest
+        self.comp = comp
+        self.jump = jump
+        self.line_number = line_number
+
+    def __repr__(self) -> str:
+        return f"Instruction({self.text!r}, line_number={self.line_number})"
+
+    @property
+    def text(self) -> str:
+        if self.command_type == CommandType.A_COMMAND:
+            return f"@{self.symbol}"
+        if self.command_type == CommandType.L_COMMAND:
+            return f"({self.symbol})"
+        text = self.comp
+        if self.dest:
+            text = f"{self.dest}={text}"
+        if self.jump:
+            text = f"{text};{self.jump}"
+        return text
+
+
+def parse_instruction(line: str, line_number: int = 0) -> Instruction:
+    # "D; JGE  // comment" -> "D;JGE"
+    line = "".join(line.partition("//")[0].split())
+    # @Xxx
+    if line.startswith('@'):
+        return Instruction(CommandType.A_COMMAND, symbol=line[1:], line_number=line_number)
+    # (Xxx)
+    if line.startswith('('):
+        return Instruction(CommandType.L_COMMAND, symbol=line[1:-1], line_number=line_number)
+
+    # dest=comp;JMP
+    # comp;JMP
+    # dest=comp
+    if "=" in line:
+        dest, _, rest = line.partition("=")
+    else:
+        dest, rest = "", line
+    comp, _, jump = rest.partition(";")
+    return Instruction(
+        CommandType.C_COMMAND, dest=dest, comp=comp, jump=jump, line_number=line_number
+    )
+
+
+# lines are raw source lines; blank lines and comment lines are skipped,
+# trailing comments are dropped and line_number keeps the 1-based position
+# in the source
+def iter_instructions(lines: Iterable[str]) -> Iterator[Instruction]:
+    for line_number, line in enumerate(lines, 1):
+        line = line.partition("//")[0].strip()
+        if line == "":
+            continue
+        yield parse_instruction(line, line_number)
+
+
+def decode_lines(lines: Iterable[str]) -> List[Instruction]:
+    return list(iter_instructions(lines))
+
+
 class Parser:
 
     def __init__(self, lines: List[str]):
         self.lines: List[str] = lines
         self.current_line: str = ""
         self.current_line_index: int = -1
+        self.current_instruction: Optional[Instruction] = None
 
     @property
     def has_more_commands(self) -> bool:
@@ -22,76 +100,40 @@ class Parser:
     def advance(self) -> None:
         self.current_line_index += 1
         self.current_line = self.lines[self.current_line_index]
+        self.current_instruction = parse_instruction(
+            self.current_line, self.current_line_index + 1
+        )
 
     def reset(self) -> None:
         self.current_line_index = -1
         self.current_line = ""
+        self.current_instruction = None
 
     @property
     def command_type(self) -> CommandType:
-        if self.current_line.startswith('@'):
-            return CommandType.A_COMMAND
-        elif self.current_line.startswith('('):
-            return CommandType.L_COMMAND
-        else:
-            return CommandType.C_COMMAND
+        return self.current_instruction.command_type
 
     @property
     def symbol(self) -> str:
         command_type = self.command_type
         if command_type != CommandType.A_COMMAND and command_type != CommandType.L_COMMAND:
             raise Exception("Command type should be A_Command or L_Command")
-
-        # @Xxx
-        if command_type == CommandType.A_COMMAND:
-            return self.current_line[1:]
-        # (Xxx)
-        if command_type == CommandType.L_COMMAND:
-            return self.current_line[1:-1]
+        return self.current_instruction.symbol
 
     @property
     def dest(self) -> str:
-        command_type = self.command_type
-        if command_type != CommandType.C_COMMAND:
+        if self.command_type != CommandType.C_COMMAND:
             raise Exception("Command type should be C_Command")
+        return self.current_instruction.dest
 
-        # dest=comp;JMP
-        # comp;JMP
-        # dest=comp
-        dest = self.current_line.split(";")[0]
-        if "=" in self.current_line:
-            return dest.split("=")[0]
-        else:
-            return ""
-
-    # 한번 테스트하기
     @property
     def comp(self) -> str:
-        command_type = self.command_type
-        if command_type != CommandType.C_COMMAND:
+        if self.command_type != CommandType.C_COMMAND:
             raise Exception("Command type should be C_Command")
-
-        # dest=comp;JMP
-        # comp;JMP
-        # dest=comp
-        if "=" not in self.current_line:
-            return self.current_line.split(";")[0]
-        else:
-            comp = self.current_line.split("=")[1]
-            comp = comp.split(";")[0]
-            return comp
+        return self.current_instruction.comp
 
     @property
     def jump(self) -> str:
-        command_type = self.command_type
-        if command_type != CommandType.C_COMMAND:
+        if self.command_type != CommandType.C_COMMAND:
             raise Exception("Command type should be C_Command")
-
-        # dest=comp;JMP
-        # dest;JMP
-        # dest
-        # dest=comp
-        if ';' in self.current_line:
-            return self.current_line.split(";")[1]
-        else:
-            return ''
+        return self.current_instruction.jump
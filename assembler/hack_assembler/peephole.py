@@ -0,0 +1,141 @@
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from hack_assembler.parser import CommandType, Instruction, parse_instruction
+
+# A rule looks at the window starting at index i and returns how many
+# instructions it matched together with their replacement, or None.
+Rule = Callable[[List[Instruction], int], Optional[Tuple[int, List[Instruction]]]]
+
+
+def _is_a(instruction: Instruction, symbol: str) -> bool:
+    return instruction.command_type == CommandType.A_COMMAND and instruction.symbol == symbol
+
+
+def _is_c(instruction: Instruction, text: str) -> bool:
+    return instruction.command_type == CommandType.C_COMMAND and instruction.text == text
+
+
+def _keeps_a(instruction: Instruction) -> bool:
+    return instruction.command_type == CommandType.C_COMMAND and "A" not in instruction.dest
+
+
+# @SP / M=M+1 / @SP / AM=M-1 -> @SP / A=M
+# a push immediately popped again leaves SP as it was and A pointing at the
+# pushed value
+def push_pop_cancel(instructions: List[Instruction], i: int):
+    window = instructions[i:i + 4]
+    if (
+        len(window) == 4
+        and _is_a(window[0], "SP")
+        and _is_c(window[1], "M=M+1")
+        and _is_a(window[2], "SP")
+        and _is_c(window[3], "AM=M-1")
+    ):
+        return 4, [window[0], parse_instruction("A=M", window[3].line_number)]
+    return None
+
+
+# @X / @Y -> @Y
+def dead_a_load(instructions: List[Instruction], i: int):
+    if (
+        i + 1 < len(instructions)
+        and instructions[i].command_type == CommandType.A_COMMAND
+        and instructions[i + 1].command_type == CommandType.A_COMMAND
+    ):
+        return 2, [instructions[i + 1]]
+    return None
+
+
+# @X / C-commands that do not write A / @X -> drop the second @X
+def redundant_reload(instructions: List[Instruction], i: int):
+    first = instructions[i]
+    if first.command_type != CommandType.A_COMMAND:
+        return None
+    j = i + 1
+    while j < len(instructions) and _keeps_a(instructions[j]):
+        j += 1
+    if j == i + 1 or j == len(instructions) or not _is_a(instructions[j], first.symbol):
+        return None
+    return j - i + 1, instructions[i:j]
+
+
+# @L / comp;JXX / (L) -> (L)
+# only when the code after the label starts by loading A, since the removed
+# jump would have left A = L behind
+def jump_to_next(instructions: List[Instruction], i: int):
+    if i + 2 >= len(instructions):
+        return None
+    target, jump = instructions[i], instructions[i + 1]
+    if (
+        target.command_type != CommandType.A_COMMAND
+        or jump.command_type != CommandType.C_COMMAND
+        or jump.jump == ""
+        or jump.dest != ""
+    ):
+        return None
+
+    j = i + 2
+    labels = set()
+    while j < len(instructions) and instructions[j].command_type == CommandType.L_COMMAND:
+        labels.add(instructions[j].symbol)
+        j += 1
+    if (
+        target.symbol in labels
+        and j < len(instructions)
+        and instructions[j].command_type == CommandType.A_COMMAND
+    ):
+        return 2, []
+    return None
+
+
+RULES: Dict[str, Rule] = {
+    "push_pop_cancel": push_pop_cancel,
+    "jump_to_next": jump_to_next,
+    "dead_a_load": dead_a_load,
+    "redundant_reload": redundant_reload,
+}
+
+
+class PeepholeOptimizer:
+
+    def __init__(self, rules: Optional[Iterable[str]] = None):
+        names = list(RULES) if rules is None else list(rules)
+        for name in names:
+            if name not in RULES:
+                raise RuntimeError(f"Unknown peephole rule: {name}")
+        self.rules: List[Tuple[str, Rule]] = [(name, RULES[name]) for name in names]
+        # instructions removed per rule
+        self.removed: Counter = Counter()
+
+    # rewrites until no rule matches anywhere
+    def optimize(self, instructions: List[Instruction]) -> List[Instruction]:
+        changed = True
+        while changed:
+            changed = False
+            optimized: List[Instruction] = []
+            i = 0
+            while i < len(instructions):
+                for name, rule in self.rules:
+                    match = rule(instructions, i)
+                    if match is not None:
+                        length, replacement = match
+                        optimized.extend(replacement)
+                        self.removed[name] += length - len(replacement)
+                        i += length
+                        changed = True
+                        break
+                else:
+                    optimized.append(instructions[i])
+                    i += 1
+            instructions = optimized
+        return instructions
+
+    def report(self) -> str:
+        return format_report([name for name, _ in self.rules], self.removed)
+
+
+def format_report(rule_names: Iterable[str], removed: Dict[str, int]) -> str:
+    lines = [f"{name:>18}: {removed.get(name, 0)} removed" for name in rule_names]
+    lines.append(f"{'total':>18}: {sum(removed.values())} removed")
+    return "\n".join(lines)
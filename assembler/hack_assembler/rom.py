@@ -0,0 +1,88 @@
+import os
+import pathlib
+import sys
+from array import array
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Union
+
+STREAM_CHUNK_WORDS = 65536
+
+# 8-bit binary strings for the high and low byte of a word, the low half
+# already carrying the line break of the .hack text format
+_HIGH_BYTE_BITS: List[str] = [f"{i:08b}" for i in range(256)]
+_LOW_BYTE_BITS: List[str] = [f"{i:08b}\n" for i in range(256)]
+
+
+def to_hack_text(words: array) -> str:
+    high = _HIGH_BYTE_BITS
+    low = _LOW_BYTE_BITS
+    return "".join([high[word >> 8] + low[word & 0xFF] for word in words])
+
+
+# packed ROM image: one little-endian 16-bit word per instruction
+def to_bin(words: array) -> bytes:
+    if sys.byteorder == "big":
+        words = array("H", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def write_hack(words: array, file_path) -> None:
+    with open(file_path, "w") as f:
+        f.write(to_hack_text(words))
+
+
+def write_bin(words: array, file_path) -> None:
+    with open(file_path, "wb") as f:
+        f.write(to_bin(words))
+
+
+WRITERS = {
+    "hack": write_hack,
+    "bin": write_bin,
+}
+
+
+def iter_chunks(words: Iterable[int], chunk_size: int = STREAM_CHUNK_WORDS) -> Iterator[array]:
+    words = iter(words)
+    while True:
+        chunk = array("H", islice(words, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# The stream writers consume words lazily and write them chunk by chunk, so
+# memory stays bounded by the chunk size. They return the number of words.
+# The chunks go to a temporary file that replaces the output only once the
+# whole stream was written, so an error midway leaves no truncated ROM.
+def _write_stream(
+    words: Iterable[int], file_path, mode: str, encode: Callable[[array], Union[str, bytes]]
+) -> int:
+    file_path = pathlib.Path(file_path)
+    temporary_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    count = 0
+    try:
+        with open(temporary_path, mode) as f:
+            for chunk in iter_chunks(words):
+                f.write(encode(chunk))
+                count += len(chunk)
+        os.replace(temporary_path, file_path)
+    finally:
+        if temporary_path.exists():
+            temporary_path.unlink()
+    return count
+
+
+def write_hack_stream(words: Iterable[int], file_path) -> int:
+    return _write_stream(words, file_path, "w", to_hack_text)
+
+
+def write_bin_stream(words: Iterable[int], file_path) -> int:
+    return _write_stream(words, file_path, "wb", to_bin)
+
+
+STREAM_WRITERS = {
+    "hack": write_hack_stream,
+    "bin": write_bin_stream,
+}
@@ -0,0 +1,161 @@
+import bisect
+import re
+import struct
+import sys
+from array import array
+from typing import List, Optional, Tuple
+
+from hack_assembler.parser import CommandType, Instruction
+
+MAGIC = b"HMAP"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHIII")
+_NO_MARKER = -1
+
+# comments written by vm_translator's CommandMarker
+START_MARKER = re.compile(r"^//\s*start of \[(.*)\]")
+END_MARKER = re.compile(r"^//\s*end of \[(.*)\]")
+
+
+# (first line, last line, command) of every marker pair in the source
+def scan_markers(lines: List[str]) -> List[Tuple[int, int, str]]:
+    spans: List[Tuple[int, int, str]] = []
+    open_markers: List[Tuple[int, str]] = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line.startswith("//"):
+            continue
+        match = START_MARKER.match(line)
+        if match is not None:
+            open_markers.append((line_number, match.group(1)))
+            continue
+        match = END_MARKER.match(line)
+        if match is not None and open_markers:
+            start_line, command = open_markers.pop()
+            spans.append((start_line, line_number, command))
+    spans.sort()
+    return spans
+
+
+# ROM address -> source line number -> enclosing VM command marker.
+# line_numbers is indexed directly by ROM address. Markers are stored as runs
+# of consecutive addresses: run_starts is sorted, so the run of an address is
+# found by binary search, and run_markers indexes into the markers table
+# (-1 for code outside any marker).
+class SourceMap:
+
+    def __init__(self):
+        self.line_numbers: array = array("I")
+        self.run_starts: array = array("H")
+        self.run_markers: array = array("i")
+        self.markers: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.line_numbers)
+
+    def line_number(self, rom_address: int) -> int:
+        return self.line_numbers[rom_address]
+
+    def marker_index(self, rom_address: int) -> int:
+        run = bisect.bisect_right(self.run_starts, rom_address) - 1
+        if run < 0:
+            return _NO_MARKER
+        return self.run_markers[run]
+
+    def marker(self, rom_address: int) -> Optional[str]:
+        index = self.marker_index(rom_address)
+        if index == _NO_MARKER:
+            return None
+        return self.markers[index]
+
+    def to_bytes(self) -> bytes:
+        line_numbers = array("I", self.line_numbers)
+        run_starts = array("H", self.run_starts)
+        run_markers = array("i", self.run_markers)
+        if sys.byteorder == "big":
+            for values in (line_numbers, run_starts, run_markers):
+                values.byteswap()
+
+        encoded_markers = [marker.encode() for marker in self.markers]
+        return b"".join(
+            [
+                _HEADER.pack(
+                    MAGIC, VERSION, len(line_numbers), len(run_starts), len(encoded_markers)
+                ),
+                line_numbers.tobytes(),
+                run_starts.tobytes(),
+                run_markers.tobytes(),
+                b"".join(struct.pack("<H", len(marker)) + marker for marker in encoded_markers),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SourceMap":
+        magic, version, address_count, run_count, marker_count = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError("Not a Hack source map.")
+
+        source_map = cls()
+        position = _HEADER.size
+        for values, count in (
+            (source_map.line_numbers, address_count),
+            (source_map.run_starts, run_count),
+            (source_map.run_markers, run_count),
+        ):
+            size = count * values.itemsize
+            values.frombytes(data[position:position + size])
+            position += size
+            if sys.byteorder == "big":
+                values.byteswap()
+
+        for _ in range(marker_count):
+            (length,) = struct.unpack_from("<H", data, position)
+            position += 2
+            source_map.markers.append(data[position:position + length].decode())
+            position += length
+
+        return source_map
+
+    def write(self, file_path) -> None:
+        with open(file_path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def read(cls, file_path) -> "SourceMap":
+        with open(file_path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+# lines are the raw source lines the instructions were decoded from, so that
+# marker comments and line numbers line up
+def build_source_map(lines: List[str], instructions: List[Instruction]) -> SourceMap:
+    source_map = SourceMap()
+
+    spans = scan_markers(lines)
+    span_starts = [start for start, _, _ in spans]
+    marker_ids = {}
+
+    current_marker = None
+    for instruction in instructions:
+        if instruction.command_type == CommandType.L_COMMAND:
+            continue
+        rom_address = len(source_map.line_numbers)
+        line_number = instruction.line_number
+        source_map.line_numbers.append(line_number)
+
+        marker = _NO_MARKER
+        span = bisect.bisect_right(span_starts, line_number) - 1
+        if span >= 0 and line_number <= spans[span][1]:
+            command = spans[span][2]
+            if command not in marker_ids:
+                marker_ids[command] = len(source_map.markers)
+                source_map.markers.append(command)
+            marker = marker_ids[command]
+
+        if marker != current_marker:
+            source_map.run_starts.append(rom_address)
+            source_map.run_markers.append(marker)
+            current_marker = marker
+
+    return source_map
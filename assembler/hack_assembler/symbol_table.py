@@ -30,7 +30,8 @@ class SymbolTable:
 
     def __init__(self):
         self.address = 0
-        self.table: Dict[str, int] = PREDEFINED_SYMBOLS
+        # copy so labels and variables of one run do not leak into the next
+        self.table: Dict[str, int] = dict(PREDEFINED_SYMBOLS)
 
     def add_entry(self, symbol: str, address: int):
         self.table[symbol] = address
@@ -0,0 +1,38 @@
+import argparse
+import pathlib
+
+from hack_assembler.linker import OBJECT_SUFFIX, ObjectCache, link
+from hack_assembler.object_file import ObjectFile
+from hack_assembler.rom import WRITERS
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Assemble modules into cached object files and link them"
+    )
+    arg_parser.add_argument(
+        "inputs", type=pathlib.Path, nargs="+", help=f".asm or {OBJECT_SUFFIX} files in ROM order"
+    )
+    arg_parser.add_argument("-o", "--output", type=pathlib.Path, required=True)
+    arg_parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=None,
+        help="where object files are kept (default: beside the output)",
+    )
+    arg_parser.add_argument("--format", choices=WRITERS.keys(), default="hack")
+    args = arg_parser.parse_args()
+
+    cache = ObjectCache(args.cache_dir or args.output.parent / "obj")
+
+    objects = []
+    for input_path in args.inputs:
+        if input_path.suffix == OBJECT_SUFFIX:
+            objects.append(ObjectFile.read(input_path))
+            continue
+        obj, cached = cache.load(input_path)
+        print(f"{'cached' if cached else 'assembled':>9} {input_path}")
+        objects.append(obj)
+
+    words = link(objects)
+    WRITERS[args.format](words, args.output)
+    print(f"linked {len(objects)} modules, {len(words)} words -> {args.output}")
@@ -1,23 +1,43 @@
+import argparse
+import glob
 import pathlib
 import sys
-from typing import List
-
-from hack_assembler.codetmp import comp, dest, jump
-from hack_assembler.parser import CommandType, Parser
-from hack_assembler.symbol_table import SymbolTable
-
-
-def should_ignore(line: str) -> bool:
-    if line.strip() == "":
-        return True
-    if line.strip().startswith("//"):
-        return True
-    return False
-
-
-def preprocess_lines(lines: List[str]) -> List[str]:
-    # if line is empty, skip it
-    return [line.strip() for line in lines if should_ignore(line) is False]
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from hack_assembler.assembler import (
+    assemble_single_pass,
+    assemble_two_pass,
+    collect_labels,
+    iter_assemble,
+)
+from hack_assembler.parser import decode_lines
+from hack_assembler.peephole import RULES, PeepholeOptimizer, format_report
+from hack_assembler.rom import STREAM_WRITERS, WRITERS
+from hack_assembler.source_map import build_source_map
+
+
+@dataclass
+class AssembleOptions:
+    single_pass: bool = False
+    output_format: str = "hack"
+    # None disables the peephole optimizer
+    peephole_rules: Optional[List[str]] = None
+    source_map: bool = False
+    stream: bool = False
+
+
+@dataclass
+class AssembleResult:
+    input_path: pathlib.Path
+    output_path: Optional[pathlib.Path] = None
+    lines: int = 0
+    words: int = 0
+    elapsed: float = 0.0
+    removed: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
 
 
 def read_file(file_path: pathlib.Path) -> List[str]:
@@ -25,63 +45,182 @@ def read_file(file_path: pathlib.Path) -> List[str]:
         return f.readlines()
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        raise ValueError("Missing required argument.")
+def iter_file(file_path: pathlib.Path) -> Iterator[str]:
+    with open(file_path, "r") as f:
+        yield from f
+
+
+# Directories and glob patterns contribute their .asm files. A file named by
+# several arguments is assembled once, at its first position, so no two
+# workers write the same output.
+def expand_inputs(inputs: List[str]) -> List[pathlib.Path]:
+    paths: List[pathlib.Path] = []
+    for name in inputs:
+        path = pathlib.Path(name)
+        if path.is_dir():
+            paths.extend(sorted(path.rglob("*.asm")))
+        elif glob.has_magic(name):
+            matches = (pathlib.Path(p) for p in glob.glob(name, recursive=True))
+            paths.extend(sorted(match for match in matches if match.suffix == ".asm" and match.is_file()))
+        else:
+            paths.append(path)
+
+    unique: Dict[pathlib.Path, pathlib.Path] = {}
+    for path in paths:
+        unique.setdefault(path.resolve(), path)
+    return list(unique.values())
+
+
+def assemble_file(input_file_path: pathlib.Path, options: AssembleOptions) -> AssembleResult:
+    result = AssembleResult(input_path=input_file_path)
+    start = time.perf_counter()
+    try:
+        output_file_path = (
+            input_file_path.parent
+            / input_file_path.with_suffix(f".{options.output_format}").name
+        )
+
+        if options.stream:
+            # label pass and encoding pass both read the file lazily; only
+            # the label table is kept between them
+            def counted_lines() -> Iterator[str]:
+                for line in iter_file(input_file_path):
+                    result.lines += 1
+                    yield line
+
+            labels = collect_labels(counted_lines())
+            words = iter_assemble(iter_file(input_file_path), labels)
+            result.words = STREAM_WRITERS[options.output_format](words, output_file_path)
+            result.output_path = output_file_path
+            return result
+
+        lines = read_file(input_file_path)
+        instructions = decode_lines(lines)
+
+        if options.peephole_rules is not None:
+            optimizer = PeepholeOptimizer(rules=options.peephole_rules)
+            instructions = optimizer.optimize(instructions)
+            result.removed = dict(optimizer.removed)
+
+        if options.single_pass:
+            words = assemble_single_pass(instructions)
+        else:
+            words = assemble_two_pass(instructions)
+
+        WRITERS[options.output_format](words, output_file_path)
+        if options.source_map:
+            build_source_map(lines, instructions).write(output_file_path.with_suffix(".hmap"))
+
+        result.output_path = output_file_path
+        result.lines = len(lines)
+        result.words = len(words)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+def assemble_files(
+    paths: List[pathlib.Path], options: AssembleOptions, jobs: Optional[int]
+) -> List[AssembleResult]:
+    if len(paths) == 1 or jobs == 1:
+        return [assemble_file(path, options) for path in paths]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(assemble_file, paths, [options] * len(paths)))
+
 
-    input_file_path = pathlib.Path(sys.argv[1])
-    output_file_path = (
-        input_file_path.parent / input_file_path.with_suffix(".hack").name
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack assembler")
+    arg_parser.add_argument(
+        "inputs",
+        nargs="+",
+        help=".asm files, directories (searched recursively) or glob patterns",
+    )
+    arg_parser.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="encode in one pass and backpatch forward label references",
+    )
+    arg_parser.add_argument(
+        "--format",
+        choices=WRITERS.keys(),
+        default="hack",
+        help="hack: binary text lines, bin: packed little-endian 16-bit words",
+    )
+    arg_parser.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="run the peephole optimizer before encoding",
+    )
+    arg_parser.add_argument(
+        "--peephole-rules",
+        default=",".join(RULES),
+        help=f"comma separated rules to apply with -O (default: all of {', '.join(RULES)})",
+    )
+    arg_parser.add_argument(
+        "--source-map",
+        action="store_true",
+        help="also write a .hmap index: ROM address -> source line -> VM command",
+    )
+    arg_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read and write incrementally with memory bounded by the label table",
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker processes when assembling several files (default: one per CPU)",
+    )
+    args = arg_parser.parse_args()
+    if args.stream and (args.optimize or args.source_map):
+        arg_parser.error("--stream works line by line and cannot be combined with -O or --source-map")
+
+    options = AssembleOptions(
+        single_pass=args.single_pass,
+        output_format=args.format,
+        peephole_rules=args.peephole_rules.split(",") if args.optimize else None,
+        source_map=args.source_map,
+        stream=args.stream,
     )
 
-    lines = read_file(sys.argv[1])
-    lines = preprocess_lines(lines)
-
-    parser = Parser(lines=lines)
-    symbol_table = SymbolTable()
-
-    rom_index = 0
-    ram_index = 16
-
-    while True:
-        if parser.has_more_commands is False:
-            break
-        parser.advance()
-
-        if parser.command_type in [CommandType.A_COMMAND, CommandType.C_COMMAND]:
-            rom_index += 1
-
-        if parser.command_type == CommandType.L_COMMAND:
-            symbol = parser.symbol
-            symbol_table.add_entry(symbol, rom_index)
-
-    outputs = []
-    parser.reset()
-    while True:
-        if parser.has_more_commands is False:
-            break
-        parser.advance()
-
-        if parser.command_type == CommandType.C_COMMAND:
-            c = comp(parser.comp)
-            d = dest(parser.dest)
-            j = jump(parser.jump)
-            output_line = f"111{c:07b}{d:03b}{j:03b}\n"
-            outputs.append(output_line)
-        elif parser.command_type == CommandType.A_COMMAND:
-            symbol = parser.symbol
-            if symbol_table.contains(symbol):
-                symbol_int = int(symbol_table.get_address(symbol))
-            elif symbol.isdecimal():
-                symbol_int = int(symbol)
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        raise ValueError("No .asm files found.")
+
+    start = time.perf_counter()
+    results = assemble_files(paths, options, args.jobs)
+    wall_time = time.perf_counter() - start
+
+    if len(results) == 1:
+        result = results[0]
+        if result.error is not None:
+            print(f"{result.input_path}: {result.error}", file=sys.stderr)
+        elif options.peephole_rules is not None:
+            print(format_report(options.peephole_rules, result.removed))
+    else:
+        for result in results:
+            if result.error is not None:
+                print(f"FAIL {result.input_path}: {result.error}")
             else:
-                symbol_table.add_entry(symbol, ram_index)
-                symbol_int = ram_index
-                ram_index += 1
-
-            output_line = f"{symbol_int:016b}\n"
-
-            outputs.append(output_line)
-
-    with open(output_file_path, "w") as f:
-        f.writelines(outputs)
+                removed = sum(result.removed.values())
+                print(
+                    f"  ok {result.input_path} {result.words} words"
+                    f" {result.elapsed * 1000:.1f} ms"
+                    + (f" ({removed} removed)" if options.peephole_rules is not None else "")
+                )
+
+        failed = sum(result.error is not None for result in results)
+        total_lines = sum(result.lines for result in results)
+        print(
+            f"{len(results) - failed}/{len(results)} files assembled,"
+            f" {total_lines} lines in {wall_time:.2f} s"
+            f" ({total_lines / wall_time:,.0f} lines/sec)"
+        )
+
+    if any(result.error is not None for result in results):
+        sys.exit(1)
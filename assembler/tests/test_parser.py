@@ -0,0 +1,15 @@
+from hack_assembler.assembler import assemble
+from hack_assembler.parser import CommandType, decode_lines, parse_instruction
+
+
+def test_inline_comment_is_stripped():
+    instruction = parse_instruction("D;JGE // GOTO End")
+    assert instruction.command_type == CommandType.C_COMMAND
+    assert (instruction.dest, instruction.comp, instruction.jump) == ("", "D", "JGE")
+
+
+def test_inline_comments_do_not_change_the_code():
+    plain = ["@END", "D;JGE", "(END)", "@END", "0;JMP"]
+    commented = ["@END // end", "D; JGE // GOTO End", "(END)  // loop", "@END", "0;JMP//"]
+    assert [i.text for i in decode_lines(commented)] == [i.text for i in decode_lines(plain)]
+    assert list(assemble(commented)) == list(assemble(plain))
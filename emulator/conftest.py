@@ -0,0 +1 @@
+# lets the tests import hack_emulator the way the CLI does
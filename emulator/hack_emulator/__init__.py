@@ -0,0 +1,3 @@
+from hack_emulator.blocks import BlockComputer
+from hack_emulator.computer import KBD, RAM_SIZE, SCREEN, Computer, to_signed
+from hack_emulator.loader import load_rom
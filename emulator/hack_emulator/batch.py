@@ -0,0 +1,115 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from hack_emulator.computer import RAM_SIZE, find_halt_jumps
+
+
+def batch_alu(control: int, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    zx, nx, zy, ny, f, no = [(control >> shift) & 1 for shift in (5, 4, 3, 2, 1, 0)]
+    if zx:
+        x = np.zeros_like(x)
+    if nx:
+        x = ~x
+    if zy:
+        y = np.zeros_like(y)
+    if ny:
+        y = ~y
+    out = x + y if f else x & y
+    if no:
+        out = ~out
+    return out
+
+
+# N copies of one Hack computer stepped in lockstep. Machine state lives in
+# NumPy arrays (ram is N x ram_size, a/d/pc are vectors), so one step runs
+# each distinct instruction once for every instance sitting on it. Instances
+# whose PCs diverge are simply grouped by PC.
+class BatchComputer:
+
+    def __init__(self, rom: Iterable[int], instances: int, ram_size: int = RAM_SIZE):
+        words = np.array(list(rom), dtype=np.uint16)
+        self.size = len(words)
+        self.is_a = (words & 0x8000) == 0
+        self.value = words & 0x7FFF
+        self.control = (words >> 6) & 0x3F
+        self.operand_m = ((words >> 12) & 1).astype(bool)
+        self.dest = (words >> 3) & 0b111
+        self.jump = words & 0b111
+        self.halt_jumps = find_halt_jumps(int(word) for word in words)
+
+        self.instances = instances
+        self.ram = np.zeros((instances, ram_size), dtype=np.uint16)
+        self.a = np.zeros(instances, dtype=np.uint16)
+        self.d = np.zeros(instances, dtype=np.uint16)
+        self.pc = np.zeros(instances, dtype=np.int64)
+        self.cycles = np.zeros(instances, dtype=np.int64)
+        self.halted = np.zeros(instances, dtype=bool)
+
+    # values is a scalar or one value per instance
+    def set_ram(self, address: int, values) -> None:
+        self.ram[:, address] = np.asarray(values).astype(np.int64) & 0xFFFF
+
+    def ram_slice(self, start: int, stop: int) -> np.ndarray:
+        return self.ram[:, start:stop].copy()
+
+    def execute(self, address: int, instances: np.ndarray) -> None:
+        if self.is_a[address]:
+            self.a[instances] = self.value[address]
+            self.pc[instances] = address + 1
+            return
+
+        a = self.a[instances]
+        y = self.ram[instances, a & 0x7FFF] if self.operand_m[address] else a
+        out = batch_alu(int(self.control[address]), self.d[instances], y)
+
+        dest = int(self.dest[address])
+        if dest & 1:
+            self.ram[instances, a & 0x7FFF] = out
+        if dest & 2:
+            self.d[instances] = out
+        if dest & 4:
+            self.a[instances] = out
+
+        jump = int(self.jump[address])
+        if not jump:
+            self.pc[instances] = address + 1
+            return
+        signed = out.view(np.int16)
+        taken = np.zeros(len(instances), dtype=bool)
+        if jump & 4:
+            taken |= signed < 0
+        if jump & 2:
+            taken |= signed == 0
+        if jump & 1:
+            taken |= signed > 0
+        self.pc[instances] = np.where(taken, a, address + 1)
+        if address in self.halt_jumps:
+            self.halted[instances[taken]] = True
+
+    # Steps every running instance until all have halted (took the jump of a
+    # loop find_halt_jumps reports, or left the ROM) or max_cycles steps were
+    # taken.
+    # Returns the number of lockstep steps.
+    def run(self, max_cycles: Optional[int] = None) -> int:
+        steps = 0
+        while max_cycles is None or steps < max_cycles:
+            self.halted |= self.pc >= self.size
+            running = np.flatnonzero(~self.halted)
+            if len(running) == 0:
+                break
+
+            pcs = self.pc[running]
+            first = pcs[0]
+            if (pcs == first).all():
+                self.execute(int(first), running)
+            else:
+                order = np.argsort(pcs, kind="stable")
+                sorted_pcs = pcs[order]
+                boundaries = np.flatnonzero(np.diff(sorted_pcs)) + 1
+                for group in np.split(order, boundaries):
+                    self.execute(int(pcs[group[0]]), running[group])
+
+            self.cycles[running] += 1
+            steps += 1
+        return steps
@@ -0,0 +1,171 @@
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from hack_emulator.computer import Computer
+from hack_emulator.decoder import COMP_TABLE, Decoded
+
+# block function: (ram, a, d, alu table) -> (next pc, a, d)
+BlockFunction = Callable[..., Tuple[int, int, int]]
+
+# Python expressions of the documented comp codes; x is D, y is A or M
+_COMP_EXPRESSIONS: Dict[int, str] = {
+    0b101010: "0",
+    0b111111: "1",
+    0b111010: "65535",
+    0b001100: "x",
+    0b110000: "y",
+    0b001101: "x ^ 65535",
+    0b110001: "y ^ 65535",
+    0b001111: "-x & 65535",
+    0b110011: "-y & 65535",
+    0b011111: "(x + 1) & 65535",
+    0b110111: "(y + 1) & 65535",
+    0b001110: "(x - 1) & 65535",
+    0b110010: "(y - 1) & 65535",
+    0b000010: "(x + y) & 65535",
+    0b010011: "(x - y) & 65535",
+    0b000111: "(y - x) & 65535",
+    0b000000: "x & y",
+    0b010101: "x | y",
+}
+
+# conditions on the unsigned 16-bit ALU output, by jump bits
+_JUMP_CONDITIONS: Dict[int, str] = {
+    1: "0 < out < 32768",
+    2: "out == 0",
+    3: "out < 32768",
+    4: "out >= 32768",
+    5: "out != 0",
+    6: "out == 0 or out >= 32768",
+    7: "True",
+}
+
+
+def comp_expression(comp: Callable, operand: int) -> str:
+    control = COMP_TABLE.index(comp)
+    y = "ram[a & 0x7FFF]" if operand else "a"
+    expression = _COMP_EXPRESSIONS.get(control)
+    if expression is None:
+        return f"alu[{control}](d, {y})"
+    return "(" + expression.replace("x", "d").replace("y", y) + ")"
+
+
+# Block boundaries known from the ROM alone: the instruction after every
+# jump, and the targets of jumps whose address is loaded right before them.
+# Jumps to other addresses (return addresses read from RAM) simply start a
+# new block at that address when first taken.
+def find_leaders(program: List[Decoded]) -> Set[int]:
+    leaders = {0}
+    for address, (comp, operand, dest, jump) in enumerate(program):
+        if comp is None or not jump:
+            continue
+        leaders.add(address + 1)
+        if address > 0 and program[address - 1][0] is None:
+            leaders.add(program[address - 1][1])
+    return leaders
+
+
+class Block:
+
+    def __init__(self, start: int, length: int, function: BlockFunction, halts: bool):
+        self.start = start
+        self.length = length
+        self.function = function
+        # ends with the jump of a final "(L) @L 0;JMP" loop
+        self.halts = halts
+        self.hits = 0
+
+
+class BlockComputer(Computer):
+
+    def __init__(self, rom: Iterable[int]):
+        super().__init__(rom)
+        self.leaders: Set[int] = find_leaders(self.program)
+        self.blocks: Dict[int, Block] = {}
+        self.compile_time = 0.0
+
+    def block_source(self, start: int) -> Tuple[str, int, bool]:
+        program = self.program
+        lines = ["def block(ram, a, d, alu):"]
+        address = start
+        while address < len(program):
+            comp, operand, dest, jump = program[address]
+            address += 1
+            if comp is None:
+                lines.append(f"    a = {operand}")
+            else:
+                expression = comp_expression(comp, operand)
+                if dest or jump:
+                    lines.append(f"    out = {expression}")
+                if jump:
+                    lines.append("    target = a")
+                if dest & 1:
+                    lines.append("    ram[a & 0x7FFF] = out")
+                if dest & 2:
+                    lines.append("    d = out")
+                if dest & 4:
+                    lines.append("    a = out")
+                if jump:
+                    lines.append(f"    if {_JUMP_CONDITIONS[jump]}:")
+                    lines.append("        return target, a, d")
+                    break
+            if address in self.leaders:
+                break
+        lines.append(f"    return {address}, a, d")
+        halts = address - 1 in self.halt_jumps
+        return "\n".join(lines), address - start, halts
+
+    def compile_block(self, start: int) -> Block:
+        began = time.perf_counter()
+        source, length, halts = self.block_source(start)
+        namespace: Dict[str, object] = {}
+        exec(compile(source, f"<block {start}>", "exec"), namespace)
+        block = Block(start, length, namespace["block"], halts)
+        self.blocks[start] = block
+        self.compile_time += time.perf_counter() - began
+        return block
+
+    # Same contract as Computer.run. Whole blocks are executed while they fit
+    # into max_cycles; the remainder is single-stepped by the interpreter.
+    def run(self, max_cycles: Optional[int] = None, stop_at_halt: bool = True) -> int:
+        blocks = self.blocks
+        size = len(self.program)
+        ram = self.ram
+        alu = COMP_TABLE
+        a, d, pc = self.a, self.d, self.pc
+
+        executed = 0
+        remaining = max_cycles if max_cycles is not None else -1
+        while pc < size:
+            block = blocks.get(pc)
+            if block is None:
+                block = self.compile_block(pc)
+            if 0 <= remaining < block.length:
+                break
+            if block.halts and stop_at_halt:
+                # the interpreter executes the loop once and flags the halt
+                break
+
+            pc, a, d = block.function(ram, a, d, alu)
+            block.hits += 1
+            executed += block.length
+            if remaining > 0:
+                remaining -= block.length
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        if pc < size and remaining != 0:
+            executed += self.interpret(remaining if remaining > 0 else None, stop_at_halt)
+        return executed
+
+    # instructions left over when the next block doesn't fit max_cycles, and
+    # the final idle loop
+    def interpret(self, max_cycles: Optional[int], stop_at_halt: bool) -> int:
+        return Computer.run(self, max_cycles, stop_at_halt)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "blocks": len(self.blocks),
+            "block_hits": sum(block.hits for block in self.blocks.values()),
+            "compile_time": self.compile_time,
+        }
@@ -0,0 +1,166 @@
+import pathlib
+import re
+from typing import Dict, Optional, Type
+
+from hack_emulator.computer import KBD, SCREEN, Computer
+from hack_emulator.decoder import COMP_TABLE, decode, jump_condition
+from hack_emulator.loader import load_rom
+from hack_emulator.script import Chip
+
+ROM_SIZE = 32768
+
+# "RAM16K[12]", "PC[]"
+_PIN = re.compile(r"^([^\[]+)(?:\[(\d*)\])?$")
+
+
+def split_pin(name: str) -> tuple:
+    match = _PIN.match(name)
+    if match is None:
+        raise RuntimeError(f"Bad pin name {name}")
+    pin, index = match.groups()
+    return pin, int(index) if index else 0
+
+
+# The CPU chip of chapter 5 with its registers as the built-in chips behave:
+# tick latches the new A, D and PC values, which the register probes
+# (ARegister[], DRegister[], PC[]) show right away, and tock moves them to
+# the outputs. outM, writeM and addressM follow the current inputs and
+# register outputs.
+class CPUChip(Chip):
+
+    def __init__(self):
+        self.inputs: Dict[str, int] = {"inM": 0, "instruction": 0, "reset": 0}
+        self.a = self.d = self.pc = 0
+        self.next_a = self.next_d = self.next_pc = 0
+
+    def set(self, name: str, value: int) -> None:
+        if name not in self.inputs:
+            super().set(name, value)
+        self.inputs[name] = value
+
+    # (outM, writeM, next A, next D, next PC) for the current inputs
+    def evaluate(self) -> tuple:
+        word = self.inputs["instruction"]
+        comp, operand, dest, jump = decode(word)
+        # the ALU is wired to the instruction bits for A-instructions too
+        y = self.inputs["inM"] if (word >> 12) & 1 else self.a
+        out = COMP_TABLE[(word >> 6) & 0x3F](self.d, y)
+
+        if comp is None:
+            next_a, next_d, write_m, jumps = word, self.d, 0, False
+        else:
+            next_a = out if dest & 4 else self.a
+            next_d = out if dest & 2 else self.d
+            write_m = dest & 1
+            jumps = bool(jump & jump_condition(out))
+
+        if self.inputs["reset"]:
+            next_pc = 0
+        elif jumps:
+            next_pc = self.a
+        else:
+            next_pc = (self.pc + 1) & 0x7FFF
+        return out, write_m, next_a, next_d, next_pc
+
+    def get(self, name: str) -> int:
+        if name in self.inputs:
+            return self.inputs[name]
+        pin, _ = split_pin(name)
+        if pin == "outM":
+            return self.evaluate()[0]
+        if pin == "writeM":
+            return self.evaluate()[1]
+        if pin == "addressM":
+            return self.a & 0x7FFF
+        if pin == "pc":
+            return self.pc
+        if pin == "ARegister":
+            return self.next_a
+        if pin == "DRegister":
+            return self.next_d
+        if pin == "PC":
+            return self.next_pc
+        return super().get(name)
+
+    def tick(self) -> None:
+        _, _, self.next_a, self.next_d, self.next_pc = self.evaluate()
+
+    def tock(self) -> None:
+        self.a, self.d, self.pc = self.next_a, self.next_d, self.next_pc
+
+
+# The Computer chip backed by the emulator: one instruction per clock cycle,
+# executed on tick. The ROM is padded to 32K words, so a program that runs
+# off its end executes zeros (@0) like the hardware does.
+class ComputerChip(Chip):
+
+    def __init__(self):
+        self.computer = Computer([0] * ROM_SIZE)
+        self.reset = 0
+
+    def load(self, part: str, file_path: pathlib.Path) -> None:
+        if part != "ROM32K":
+            super().load(part, file_path)
+        words = load_rom(file_path)
+        words.extend([0] * (ROM_SIZE - len(words)))
+        computer = Computer(words)
+        computer.ram = self.computer.ram
+        computer.a, computer.d, computer.pc = self.computer.a, self.computer.d, self.computer.pc
+        self.computer = computer
+
+    def address(self, name: str) -> Optional[int]:
+        pin, index = split_pin(name)
+        if pin == "RAM16K":
+            return index
+        if pin == "Screen":
+            return SCREEN + index
+        if pin == "Keyboard":
+            return KBD
+        return None
+
+    def set(self, name: str, value: int) -> None:
+        pin, _ = split_pin(name)
+        address = self.address(name)
+        if name == "reset":
+            self.reset = value
+        elif address is not None:
+            self.computer.poke(address, value)
+        elif pin == "ARegister":
+            self.computer.a = value
+        elif pin == "DRegister":
+            self.computer.d = value
+        elif pin == "PC":
+            self.computer.pc = value
+        else:
+            super().set(name, value)
+
+    def get(self, name: str) -> int:
+        pin, _ = split_pin(name)
+        address = self.address(name)
+        if name == "reset":
+            return self.reset
+        if address is not None:
+            return self.computer.peek(address)
+        if pin == "ARegister":
+            return self.computer.a
+        if pin == "DRegister":
+            return self.computer.d
+        if pin == "PC":
+            return self.computer.pc
+        return super().get(name)
+
+    def tick(self) -> None:
+        self.computer.step()
+        if self.reset:
+            self.computer.pc = 0
+
+
+BUILTIN_CHIPS: Dict[str, Type[Chip]] = {
+    "CPU": CPUChip,
+    "Computer": ComputerChip,
+}
+
+
+def load_builtin_chip(hdl_path: pathlib.Path) -> Optional[Chip]:
+    chip = BUILTIN_CHIPS.get(hdl_path.stem)
+    return chip() if chip is not None else None
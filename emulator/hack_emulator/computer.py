@@ -0,0 +1,109 @@
+from array import array
+from typing import Iterable, List, Optional, Set
+
+from hack_emulator.decoder import Decoded, decode_rom
+
+RAM_SIZE = 32768
+SCREEN = 16384
+KBD = 24576
+
+# 0;JMP encoded
+_UNCONDITIONAL_JUMP = 0b1110101010000111
+
+
+def to_signed(value: int) -> int:
+    return value - 0x10000 if value & 0x8000 else value
+
+
+# Addresses of the jump in every idle loop, the usual way a Hack program
+# ends: an "@L 0;JMP" back to L, like "(END) @END 0;JMP", where nothing
+# between L and the jump branches, writes memory or reads the keyboard.
+# Loops that keep changing memory are still running and are not counted.
+def find_halt_jumps(words: Iterable[int]) -> Set[int]:
+    words = list(words)
+    halt_jumps: Set[int] = set()
+    for address in range(1, len(words)):
+        target = words[address - 1]
+        if words[address] != _UNCONDITIONAL_JUMP or target & 0x8000 or target >= address:
+            continue
+        body = words[target:address - 1]
+        # C-instructions with a jump or with M among their destinations
+        effects = any(word & 0x8000 and word & 0b1111 for word in body)
+        if not effects and KBD not in body:
+            halt_jumps.add(address)
+    return halt_jumps
+
+
+class Computer:
+
+    def __init__(self, rom: Iterable[int]):
+        self.rom: array = array("H", rom)
+        self.program: List[Decoded] = decode_rom(self.rom)
+        self.halt_jumps: Set[int] = find_halt_jumps(self.rom)
+        self.ram: array = array("H", bytes(2 * RAM_SIZE))
+        self.a: int = 0
+        self.d: int = 0
+        self.pc: int = 0
+        self.cycles: int = 0
+        self.halted: bool = False
+
+    # like the reset input of the Hack computer: PC = 0, memory untouched
+    def reset(self) -> None:
+        self.pc = 0
+        self.halted = False
+
+    def peek(self, address: int) -> int:
+        return self.ram[address]
+
+    def poke(self, address: int, value: int) -> None:
+        self.ram[address] = value & 0xFFFF
+
+    def step(self) -> None:
+        self.run(1, stop_at_halt=False)
+
+    # Runs until max_cycles instructions were executed, the PC leaves the ROM
+    # or, with stop_at_halt, the program enters its final idle loop. Returns
+    # the number of instructions executed.
+    def run(self, max_cycles: Optional[int] = None, stop_at_halt: bool = True) -> int:
+        program = self.program
+        size = len(program)
+        ram = self.ram
+        halt_jumps = self.halt_jumps if stop_at_halt else ()
+        a, d, pc = self.a, self.d, self.pc
+        limit = max_cycles if max_cycles is not None else -1
+
+        executed = 0
+        while executed != limit:
+            if pc >= size:
+                break
+            comp, operand, dest, jump = program[pc]
+            executed += 1
+
+            if comp is None:
+                a = operand
+                pc += 1
+                continue
+
+            out = comp(d, ram[a & 0x7FFF] if operand else a)
+
+            if jump and jump & (4 if out & 0x8000 else 2 if out == 0 else 1):
+                if pc in halt_jumps:
+                    self.halted = True
+                    pc = a
+                    break
+                target = a
+            else:
+                target = pc + 1
+
+            if dest:
+                if dest & 1:
+                    ram[a & 0x7FFF] = out
+                if dest & 2:
+                    d = out
+                if dest & 4:
+                    a = out
+            pc = target
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        return executed
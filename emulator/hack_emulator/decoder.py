@@ -0,0 +1,89 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+MASK = 0xFFFF
+
+ALU = Callable[[int, int], int]
+
+# Specialized ALU functions for the 18 documented comp codes (6 bits without
+# the a-bit). x is D, y is A or M depending on the a-bit.
+_COMP_FUNCTIONS: Dict[int, ALU] = {
+    0b101010: lambda x, y: 0,
+    0b111111: lambda x, y: 1,
+    0b111010: lambda x, y: MASK,
+    0b001100: lambda x, y: x,
+    0b110000: lambda x, y: y,
+    0b001101: lambda x, y: x ^ MASK,
+    0b110001: lambda x, y: y ^ MASK,
+    0b001111: lambda x, y: -x & MASK,
+    0b110011: lambda x, y: -y & MASK,
+    0b011111: lambda x, y: (x + 1) & MASK,
+    0b110111: lambda x, y: (y + 1) & MASK,
+    0b001110: lambda x, y: (x - 1) & MASK,
+    0b110010: lambda x, y: (y - 1) & MASK,
+    0b000010: lambda x, y: (x + y) & MASK,
+    0b010011: lambda x, y: (x - y) & MASK,
+    0b000111: lambda x, y: (y - x) & MASK,
+    0b000000: lambda x, y: x & y,
+    0b010101: lambda x, y: x | y,
+}
+
+
+# the ALU as wired in the CPU, for the undocumented comp codes
+def alu(control: int) -> ALU:
+    zx, nx, zy, ny, f, no = [(control >> shift) & 1 for shift in (5, 4, 3, 2, 1, 0)]
+
+    def compute(x: int, y: int) -> int:
+        if zx:
+            x = 0
+        if nx:
+            x ^= MASK
+        if zy:
+            y = 0
+        if ny:
+            y ^= MASK
+        out = (x + y) & MASK if f else x & y
+        if no:
+            out ^= MASK
+        return out
+
+    return compute
+
+
+COMP_TABLE: List[ALU] = [_COMP_FUNCTIONS.get(control) or alu(control) for control in range(64)]
+
+# A decoded instruction is (alu, operand, dest, jump):
+# A-instruction: (None, value, 0, 0)
+# C-instruction: (alu, 1 if the operand is M else 0, dest bits, jump bits)
+#   dest bits: 4 = A, 2 = D, 1 = M; jump bits: 4 = <0, 2 = =0, 1 = >0
+Decoded = Tuple[Optional[ALU], int, int, int]
+
+_DECODED_CACHE: Dict[int, Decoded] = {}
+
+
+def decode(word: int) -> Decoded:
+    decoded = _DECODED_CACHE.get(word)
+    if decoded is None:
+        if word & 0x8000 == 0:
+            decoded = (None, word, 0, 0)
+        else:
+            decoded = (
+                COMP_TABLE[(word >> 6) & 0x3F],
+                (word >> 12) & 1,
+                (word >> 3) & 0b111,
+                word & 0b111,
+            )
+        _DECODED_CACHE[word] = decoded
+    return decoded
+
+
+def decode_rom(words) -> List[Decoded]:
+    return [decode(word) for word in words]
+
+
+# condition bit of jump field that a given ALU output satisfies
+def jump_condition(out: int) -> int:
+    if out & 0x8000:
+        return 4
+    if out == 0:
+        return 2
+    return 1
@@ -0,0 +1,184 @@
+import os
+import select
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from hack_emulator.computer import KBD, Computer
+
+# (cycle, key code): from that cycle on RAM[KBD] holds the code, 0 = no key
+KeyEvent = Tuple[int, int]
+
+# special keys of the Hack character set
+KEY_CODES: Dict[str, int] = {
+    "NONE": 0,
+    "SPACE": 32,
+    "NEWLINE": 128,
+    "BACKSPACE": 129,
+    "LEFT": 130,
+    "UP": 131,
+    "RIGHT": 132,
+    "DOWN": 133,
+    "HOME": 134,
+    "END": 135,
+    "PAGEUP": 136,
+    "PAGEDOWN": 137,
+    "INSERT": 138,
+    "DELETE": 139,
+    "ESC": 140,
+    **{f"F{number}": 140 + number for number in range(1, 13)},
+}
+KEY_NAMES: Dict[int, str] = {code: name for name, code in KEY_CODES.items()}
+
+# terminal input -> key code
+_TERMINAL_KEYS: Dict[str, int] = {
+    "\x1b[A": KEY_CODES["UP"],
+    "\x1b[B": KEY_CODES["DOWN"],
+    "\x1b[C": KEY_CODES["RIGHT"],
+    "\x1b[D": KEY_CODES["LEFT"],
+    "\x1b[H": KEY_CODES["HOME"],
+    "\x1b[F": KEY_CODES["END"],
+    "\x1b": KEY_CODES["ESC"],
+    "\x7f": KEY_CODES["BACKSPACE"],
+    "\r": KEY_CODES["NEWLINE"],
+    "\n": KEY_CODES["NEWLINE"],
+}
+
+
+# "LEFT", "a", "#9", "200"; a single character is always that character,
+# so codes without a name or printable character are written as "#<code>"
+def parse_key(text: str) -> int:
+    if text.upper() in KEY_CODES:
+        return KEY_CODES[text.upper()]
+    if len(text) == 1:
+        return ord(text)
+    number = text[1:] if text.startswith("#") else text
+    if number.isdigit() and int(number) <= 0xFFFF:
+        return int(number)
+    raise RuntimeError(f"Unknown key {text}.")
+
+
+def key_name(code: int) -> str:
+    if code in KEY_NAMES:
+        return KEY_NAMES[code]
+    if 32 < code < 127:
+        return chr(code)
+    return f"#{code}"
+
+
+# One "<cycle> <key>" event per line, cycles ascending. Blank lines and lines
+# starting with "#" are ignored.
+def parse_script(lines: Iterable[str]) -> List[KeyEvent]:
+    events: List[KeyEvent] = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        fields = line.split()
+        if len(fields) != 2 or not fields[0].isdigit():
+            raise RuntimeError(f"line {line_number}: expected '<cycle> <key>', got {line}")
+        cycle = int(fields[0])
+        if events and cycle < events[-1][0]:
+            raise RuntimeError(f"line {line_number}: cycle {cycle} is earlier than the previous event")
+        events.append((cycle, parse_key(fields[1])))
+    return events
+
+
+def read_script(file_path) -> List[KeyEvent]:
+    with open(file_path, "r") as f:
+        return parse_script(f)
+
+
+def write_script(file_path, events: List[KeyEvent]) -> None:
+    with open(file_path, "w") as f:
+        f.writelines(f"{cycle} {key_name(code)}\n" for cycle, code in events)
+
+
+# Replays events into RAM[KBD]. Runs are split at event cycles, so the same
+# script gives the same execution on every engine. Cycles are the machine's
+# total cycle count, which also holds for a machine restored from a state.
+class Replay:
+
+    def __init__(self, events: List[KeyEvent]):
+        self.events = events
+        self.position = 0
+
+    def run(self, computer: Computer, max_cycles: Optional[int] = None) -> int:
+        end = computer.cycles + max_cycles if max_cycles is not None else None
+        executed = 0
+        while True:
+            # events before the current cycle already happened (or belong to
+            # a restored state)
+            while self.position < len(self.events) and self.events[self.position][0] <= computer.cycles:
+                cycle, code = self.events[self.position]
+                if cycle == computer.cycles:
+                    computer.poke(KBD, code)
+                self.position += 1
+
+            stop = end
+            if self.position < len(self.events):
+                next_event = self.events[self.position][0]
+                stop = next_event if stop is None else min(stop, next_event)
+
+            wanted = stop - computer.cycles if stop is not None else None
+            ran = computer.run(wanted)
+            executed += ran
+            if ran != wanted or stop == end:
+                return executed
+
+
+# Records key presses from the terminal while the program runs. The machine is
+# run in slices of slice_cycles; a terminal reports no key releases, so a key
+# stays down for hold_cycles. The events replay with Replay.
+class TerminalRecorder:
+
+    def __init__(self, slice_cycles: int = 100_000, hold_cycles: int = 500_000):
+        self.slice_cycles = slice_cycles
+        self.hold_cycles = hold_cycles
+        self.events: List[KeyEvent] = []
+        self.release_at: Optional[int] = None
+
+    def record(self, computer: Computer, code: int) -> None:
+        computer.poke(KBD, code)
+        if not self.events or self.events[-1][1] != code:
+            self.events.append((computer.cycles, code))
+
+    def read_keys(self) -> List[int]:
+        codes = []
+        while select.select([sys.stdin], [], [], 0)[0]:
+            text = os.read(sys.stdin.fileno(), 16).decode(errors="ignore")
+            if text == "":
+                break
+            if text in _TERMINAL_KEYS:
+                codes.append(_TERMINAL_KEYS[text])
+            else:
+                codes.extend(ord(character) for character in text if ord(character) < 128)
+        return codes
+
+    def run(self, computer: Computer, max_cycles: Optional[int] = None) -> int:
+        # only recording needs a POSIX terminal
+        import termios
+        import tty
+
+        settings = termios.tcgetattr(sys.stdin)
+        tty.setcbreak(sys.stdin.fileno())
+        try:
+            end = computer.cycles + max_cycles if max_cycles is not None else None
+            executed = 0
+            while end is None or computer.cycles < end:
+                for code in self.read_keys():
+                    self.record(computer, code)
+                    self.release_at = computer.cycles + self.hold_cycles
+                if self.release_at is not None and computer.cycles >= self.release_at:
+                    self.record(computer, 0)
+                    self.release_at = None
+
+                wanted = self.slice_cycles
+                if end is not None:
+                    wanted = min(wanted, end - computer.cycles)
+                ran = computer.run(wanted)
+                executed += ran
+                if ran != wanted:
+                    break
+            return executed
+        finally:
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, settings)
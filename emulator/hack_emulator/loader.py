@@ -0,0 +1,24 @@
+import pathlib
+import sys
+from array import array
+
+
+def load_hack(file_path) -> array:
+    with open(file_path, "r") as f:
+        return array("H", [int(line, 2) for line in f if line.strip() != ""])
+
+
+# packed ROM image written by the assembler: little-endian 16-bit words
+def load_bin(file_path) -> array:
+    words = array("H")
+    with open(file_path, "rb") as f:
+        words.frombytes(f.read())
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def load_rom(file_path) -> array:
+    if pathlib.Path(file_path).suffix == ".bin":
+        return load_bin(file_path)
+    return load_hack(file_path)
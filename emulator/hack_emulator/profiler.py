@@ -0,0 +1,190 @@
+import struct
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from hack_emulator.blocks import BlockComputer
+from hack_emulator.computer import Computer
+
+FUNCTION_KEYWORD = "function "
+
+# frame for code before the first function marker or label
+TOP_FRAME = "(top)"
+
+# header of the assembler's .hmap files (hack_assembler.source_map)
+HMAP_MAGIC = b"HMAP"
+HMAP_VERSION = 1
+_HMAP_HEADER = struct.Struct("<4sHIII")
+
+# line number and VM command marker (None outside any marker) per ROM address
+SourceMapEntries = Tuple[array, List[Optional[str]]]
+
+
+# Reads an .hmap written by the assembler's --source-map. The format is
+# parsed here so the emulator does not need the assembler package.
+def read_source_map(file_path) -> SourceMapEntries:
+    with open(file_path, "rb") as f:
+        data = f.read()
+    magic, version, address_count, run_count, marker_count = _HMAP_HEADER.unpack_from(data)
+    if magic != HMAP_MAGIC or version != HMAP_VERSION:
+        raise RuntimeError(f"{file_path} is not a Hack source map.")
+
+    line_numbers, run_starts, run_markers = array("I"), array("H"), array("i")
+    position = _HMAP_HEADER.size
+    for values, count in ((line_numbers, address_count), (run_starts, run_count), (run_markers, run_count)):
+        size = count * values.itemsize
+        values.frombytes(data[position:position + size])
+        position += size
+        if sys.byteorder == "big":
+            values.byteswap()
+
+    names: List[str] = []
+    for _ in range(marker_count):
+        (length,) = struct.unpack_from("<H", data, position)
+        position += 2
+        names.append(data[position:position + length].decode())
+        position += length
+
+    # runs of consecutive addresses share a marker, -1 for none
+    markers: List[Optional[str]] = []
+    run_ends = list(run_starts[1:]) + [address_count]
+    for run_start, run_end, marker in zip(run_starts, run_ends, run_markers):
+        markers.extend([names[marker] if marker >= 0 else None] * (run_end - run_start))
+    return line_numbers, markers
+
+
+# ROM address -> line number, enclosing label, function and VM command of the
+# .asm source a ROM was assembled from. With the assembler's .hmap the
+# addresses and VM commands come from it, which stays right when the peephole
+# optimizer removed instructions. Without one, addresses are counted the way
+# the unoptimized assembler does (every line that is not blank, a comment or
+# a label is one instruction) and only labels are known. Functions come from
+# the translator's "function" markers; unmarked code falls back to the last
+# Jack-style "Class.name" label.
+class SourceIndex:
+
+    def __init__(self):
+        self.line_numbers: array = array("I")
+        self.labels: List[Optional[str]] = []
+        self.functions: List[Optional[str]] = []
+        self.commands: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.line_numbers)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], source_map: Optional[SourceMapEntries] = None) -> "SourceIndex":
+        index = cls()
+        # line number -> (label, last "Class.name" label) of every instruction line
+        context: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        label: Optional[str] = None
+        label_function: Optional[str] = None
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if line == "" or line.startswith("//"):
+                continue
+            if line.startswith("("):
+                label = line[1:line.index(")")]
+                if "." in label:
+                    label_function = label.split("$")[0]
+                continue
+            context[line_number] = (label, label_function)
+
+        if source_map is None:
+            line_numbers = sorted(context)
+            markers: List[Optional[str]] = [None] * len(line_numbers)
+        else:
+            line_numbers, markers = source_map
+
+        function: Optional[str] = None
+        for line_number, command in zip(line_numbers, markers):
+            label, label_function = context.get(line_number, (None, None))
+            if command is not None and command.startswith(FUNCTION_KEYWORD):
+                function = command.split()[1]
+            index.line_numbers.append(line_number)
+            index.labels.append(label)
+            index.functions.append(function or label_function)
+            index.commands.append(command)
+        return index
+
+    @classmethod
+    def read(cls, file_path, source_map_path=None) -> "SourceIndex":
+        source_map = read_source_map(source_map_path) if source_map_path is not None else None
+        with open(file_path, "r") as f:
+            return cls.from_lines(f, source_map)
+
+    def function(self, rom_address: int) -> str:
+        return self.functions[rom_address] or TOP_FRAME
+
+    # VM command text, e.g. "push constant 7" or "call Math.multiply 2";
+    # instructions outside any marker are named after their label
+    def command(self, rom_address: int) -> str:
+        command = self.commands[rom_address]
+        if command is not None:
+            return command
+        return f"({self.labels[rom_address] or TOP_FRAME})"
+
+
+# BlockComputer that knows how often every ROM address was executed. Whole
+# blocks are counted through their hit counters; the few instructions the
+# interpreter runs are single-stepped and counted one by one.
+class ProfilingComputer(BlockComputer):
+
+    def __init__(self, rom: Iterable[int]):
+        super().__init__(rom)
+        self.interpreted: array = array("Q", bytes(8 * len(self.program)))
+
+    def interpret(self, max_cycles: Optional[int], stop_at_halt: bool) -> int:
+        size = len(self.program)
+        limit = max_cycles if max_cycles is not None else -1
+        executed = 0
+        while executed != limit and self.pc < size:
+            pc = self.pc
+            Computer.run(self, 1, stop_at_halt)
+            self.interpreted[pc] += 1
+            executed += 1
+            if stop_at_halt and pc in self.halt_jumps:
+                break
+        return executed
+
+    def address_counts(self) -> array:
+        counts = array("Q", self.interpreted)
+        for block in self.blocks.values():
+            if block.hits:
+                for address in range(block.start, block.start + block.length):
+                    counts[address] += block.hits
+        return counts
+
+
+def fold_functions(counts: array, index: SourceIndex) -> Counter:
+    totals: Counter = Counter()
+    for address, count in enumerate(counts):
+        if count and address < len(index):
+            totals[index.function(address)] += count
+    return totals
+
+
+def fold_commands(counts: array, index: SourceIndex) -> Counter:
+    totals: Counter = Counter()
+    for address, count in enumerate(counts):
+        if count and address < len(index):
+            totals[index.command(address)] += count
+    return totals
+
+
+# "function;command count" lines for flamegraph.pl and speedscope
+def collapsed_stacks(counts: array, index: SourceIndex) -> List[str]:
+    stacks: Counter = Counter()
+    for address, count in enumerate(counts):
+        if count and address < len(index):
+            stacks[f"{index.function(address)};{index.command(address)}"] += count
+    return [f"{stack} {count}" for stack, count in sorted(stacks.items())]
+
+
+def format_table(title: str, totals: Counter, limit: Optional[int] = None) -> List[str]:
+    total = sum(totals.values())
+    lines = [f"{'cycles':>12} {'%':>6}  {title}"]
+    for name, count in totals.most_common(limit):
+        lines.append(f"{count:>12} {100 * count / max(total, 1):>6.2f}  {name}")
+    return lines
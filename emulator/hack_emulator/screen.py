@@ -0,0 +1,143 @@
+import pathlib
+import struct
+import sys
+import zlib
+from array import array
+from typing import Optional, Tuple
+
+from hack_emulator.computer import SCREEN, Computer
+
+WIDTH = 512
+HEIGHT = 256
+WORDS_PER_ROW = WIDTH // 16
+SCREEN_WORDS = WORDS_PER_ROW * HEIGHT
+ROW_BYTES = WIDTH // 8
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# The leftmost pixel of a screen word is its bit 0, while PBM and PNG pack
+# the leftmost pixel into the most significant bit. Reversing the bits of
+# every byte (low byte first) turns screen memory into packed image rows.
+# PBM uses 1 for black like the Hack screen; 1-bit grayscale PNG uses 0.
+_REVERSED_BITS = bytes(int(f"{value:08b}"[::-1], 2) for value in range(256))
+_INVERTED_BITS = bytes(value ^ 0xFF for value in range(256))
+
+
+# Zero-copy (HEIGHT, WORDS_PER_ROW) view of the screen memory map. It always
+# shows the current RAM; np.asarray(view) wraps it without copying as well.
+def screen_view(computer: Computer) -> memoryview:
+    words = memoryview(computer.ram)[SCREEN:SCREEN + SCREEN_WORDS]
+    return words.cast("B").cast("H", (HEIGHT, WORDS_PER_ROW))
+
+
+# the frame as packed rows, 1 bit per pixel, 1 = black
+def frame_bits(view: memoryview) -> bytes:
+    data = view.tobytes()
+    if sys.byteorder == "big":
+        words = array("H")
+        words.frombytes(data)
+        words.byteswap()
+        data = words.tobytes()
+    return data.translate(_REVERSED_BITS)
+
+
+def to_pbm(bits: bytes) -> bytes:
+    return f"P4\n{WIDTH} {HEIGHT}\n".encode() + bits
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def to_png(bits: bytes) -> bytes:
+    # 0 = black in grayscale, so flip the bits back; filter type 0 per row
+    inverted = bits.translate(_INVERTED_BITS)
+    rows = b"".join(
+        b"\x00" + inverted[start:start + ROW_BYTES] for start in range(0, len(inverted), ROW_BYTES)
+    )
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", WIDTH, HEIGHT, 1, 0, 0, 0, 0)),
+            _png_chunk(b"IDAT", zlib.compress(rows, 9)),
+            _png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def from_pbm(data: bytes) -> bytes:
+    fields = data.split(maxsplit=3)
+    if len(fields) < 4 or fields[0] != b"P4" or (int(fields[1]), int(fields[2])) != (WIDTH, HEIGHT):
+        raise RuntimeError(f"Expected a binary {WIDTH}x{HEIGHT} PBM image.")
+    # the pixels follow the single whitespace byte ending the header
+    return data[len(data) - ROW_BYTES * HEIGHT:]
+
+
+# reads the 1-bit grayscale PNGs written by to_png
+def from_png(data: bytes) -> bytes:
+    if not data.startswith(PNG_SIGNATURE):
+        raise RuntimeError("Not a PNG image.")
+    position = len(PNG_SIGNATURE)
+    header = b""
+    compressed = []
+    while position < len(data):
+        (length,) = struct.unpack_from(">I", data, position)
+        kind = data[position + 4:position + 8]
+        chunk = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b"IHDR":
+            header = chunk
+        elif kind == b"IDAT":
+            compressed.append(chunk)
+        elif kind == b"IEND":
+            break
+    if header != struct.pack(">IIBBBBB", WIDTH, HEIGHT, 1, 0, 0, 0, 0):
+        raise RuntimeError(f"Expected a 1-bit grayscale {WIDTH}x{HEIGHT} PNG image.")
+
+    rows = zlib.decompress(b"".join(compressed))
+    inverted = bytearray()
+    for start in range(0, len(rows), ROW_BYTES + 1):
+        if rows[start] != 0:
+            raise RuntimeError("Only PNG images without row filters are supported.")
+        inverted += rows[start + 1:start + 1 + ROW_BYTES]
+    return bytes(inverted).translate(_INVERTED_BITS)
+
+
+FORMATS = {
+    ".pbm": (to_pbm, from_pbm),
+    ".png": (to_png, from_png),
+}
+
+
+def write_image(file_path, bits: bytes) -> None:
+    encode, _ = FORMATS[pathlib.Path(file_path).suffix]
+    with open(file_path, "wb") as f:
+        f.write(encode(bits))
+
+
+def read_image(file_path) -> bytes:
+    _, decode = FORMATS[pathlib.Path(file_path).suffix]
+    with open(file_path, "rb") as f:
+        return decode(f.read())
+
+
+# (number of differing pixels, (left, top, right, bottom) bounding box of the
+# differences or None)
+def diff_frames(bits: bytes, golden: bytes) -> Tuple[int, Optional[Tuple[int, int, int, int]]]:
+    if bits == golden:
+        return 0, None
+
+    pixels = 0
+    left, top, right, bottom = WIDTH, HEIGHT, -1, -1
+    for offset, (ours, theirs) in enumerate(zip(bits, golden)):
+        difference = ours ^ theirs
+        if difference == 0:
+            continue
+        pixels += difference.bit_count()
+        row, column = divmod(offset, ROW_BYTES)
+        top = min(top, row)
+        bottom = row
+        # most significant bit is the leftmost pixel
+        left = min(left, column * 8 + 8 - difference.bit_length())
+        right = max(right, column * 8 + 8 - (difference & -difference).bit_length())
+    return pixels, (left, top, right, bottom)
@@ -0,0 +1,291 @@
+import pathlib
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+from hack_emulator.computer import to_signed
+
+
+# a chip under test, as seen from a test script
+class Chip:
+
+    def set(self, name: str, value: int) -> None:
+        raise RuntimeError(f"{type(self).__name__} has no input {name}")
+
+    def get(self, name: str) -> int:
+        raise RuntimeError(f"{type(self).__name__} has no pin {name}")
+
+    def eval(self) -> None:
+        pass
+
+    def tick(self) -> None:
+        pass
+
+    def tock(self) -> None:
+        pass
+
+    # "ROM32K load Max.hack"
+    def load(self, part: str, file_path: pathlib.Path) -> None:
+        raise RuntimeError(f"{type(self).__name__} cannot load {file_path} into {part}")
+
+
+# .hdl path -> chip, or None if there is no model for it
+ChipLoader = Callable[[pathlib.Path], Optional[Chip]]
+
+_TOKEN = re.compile(r'"[^"]*"|[{},;!]|[^\s{},;!]+')
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_COLUMN = re.compile(r"^([^%]+)(?:%([BDSX])(\d+)\.(\d+)\.(\d+))?$")
+
+
+_CONDITIONS: Dict[str, Callable[[int, int], bool]] = {
+    "=": lambda x, y: x == y,
+    "<>": lambda x, y: x != y,
+    "<": lambda x, y: x < y,
+    ">": lambda x, y: x > y,
+    "<=": lambda x, y: x <= y,
+    ">=": lambda x, y: x >= y,
+}
+
+
+# a script the runner skips: no model for its chip, or it waits for the user
+class Unsupported(RuntimeError):
+    pass
+
+
+# one output-list entry such as RAM16K[0]%D1.7.1: name, format, left
+# padding, width, right padding
+class OutputColumn:
+
+    def __init__(self, name: str, kind: str, left: int, width: int, right: int):
+        self.name = name
+        self.kind = kind
+        self.left = left
+        self.width = width
+        self.right = right
+
+    @classmethod
+    def parse(cls, text: str) -> "OutputColumn":
+        match = _COLUMN.match(text)
+        if match is None:
+            raise RuntimeError(f"Bad output-list entry {text}")
+        name, kind, left, width, right = match.groups()
+        if kind is None:
+            return cls(name, "B", 1, 16, 1)
+        return cls(name, kind, int(left), int(width), int(right))
+
+    @property
+    def size(self) -> int:
+        return self.left + self.width + self.right
+
+    # the name centered, cut to the column size
+    def header(self) -> str:
+        name = self.name[:self.size]
+        left = (self.size - len(name)) // 2
+        return " " * left + name + " " * (self.size - left - len(name))
+
+    def format(self, value: Union[int, str]) -> str:
+        if self.kind == "S":
+            text = str(value).ljust(self.width)
+        elif self.kind == "D":
+            text = str(to_signed(value & 0xFFFF)).rjust(self.width)
+        elif self.kind == "X":
+            text = f"{value & 0xFFFF:X}".rjust(self.width, "0")[-self.width:]
+        else:
+            text = f"{value & 0xFFFF:016b}"[-self.width:]
+        return " " * self.left + text + " " * self.right
+
+
+# %B0101, %XFF, %D-1 or plain decimal
+def parse_value(text: str) -> int:
+    if text.startswith("%B"):
+        value = int(text[2:], 2)
+    elif text.startswith("%X"):
+        value = int(text[2:], 16)
+    elif text.startswith("%D"):
+        value = int(text[2:])
+    else:
+        value = int(text)
+    return value & 0xFFFF
+
+
+# A parsed script is a list of commands; a command is its list of words,
+# ("repeat", count, body) for repeat blocks (count -1 repeats forever) or
+# ("while", condition words, body).
+Command = Union[List[str], tuple]
+
+
+def parse_script(text: str) -> List[Command]:
+    tokens = _TOKEN.findall(_COMMENT.sub(" ", text))
+    position = 0
+
+    def parse_block() -> List[Command]:
+        nonlocal position
+        commands: List[Command] = []
+        words: List[str] = []
+        while position < len(tokens):
+            token = tokens[position]
+            position += 1
+            if token == "{":
+                if words and words[0] == "repeat":
+                    count = int(words[1]) if len(words) > 1 else -1
+                    commands.append(("repeat", count, parse_block()))
+                elif words and words[0] == "while" and len(words) == 4:
+                    commands.append(("while", words[1:], parse_block()))
+                else:
+                    raise RuntimeError(f"Unexpected '{{' after {' '.join(words)}")
+                words = []
+            elif token == "}":
+                if words:
+                    commands.append(words)
+                return commands
+            elif token in (",", ";", "!"):
+                if words:
+                    commands.append(words)
+                words = []
+            else:
+                words.append(token)
+        if words:
+            commands.append(words)
+        return commands
+
+    return parse_block()
+
+
+@dataclass
+class ScriptResult:
+    script_path: pathlib.Path
+    # where the script asked its output to be written
+    output_path: Optional[pathlib.Path] = None
+    output: List[str] = field(default_factory=list)
+    compared: int = 0
+    # first line that differs from the compare file
+    mismatch: Optional[str] = None
+    error: Optional[str] = None
+    skipped: Optional[str] = None
+
+    @property
+    def passed(self) -> bool:
+        return self.mismatch is None and self.error is None and self.skipped is None
+
+
+class _ComparisonFailure(Exception):
+    pass
+
+
+# Interprets the subset of the nand2tetris test script language used by the
+# CPU and Computer tests: load, output-file, compare-to, output-list, output,
+# set, eval, tick, tock, ticktock, repeat, while and echo. Execution stops at the
+# first output line that differs from the compare file.
+class TestScript:
+
+    def __init__(self, script_path: pathlib.Path, load_chip: ChipLoader):
+        self.script_path = script_path
+        self.directory = script_path.parent
+        self.load_chip = load_chip
+        self.chip: Optional[Chip] = None
+        self.columns: List[OutputColumn] = []
+        self.compare_lines: Optional[List[str]] = None
+        self.time = 0
+        self.after_tick = False
+        self.result = ScriptResult(script_path)
+
+    def run(self) -> ScriptResult:
+        try:
+            with open(self.script_path, "r") as f:
+                self.execute(parse_script(f.read()))
+        except _ComparisonFailure:
+            pass
+        except Unsupported as e:
+            self.result.skipped = str(e)
+        except Exception as e:
+            self.result.error = f"{type(e).__name__}: {e}"
+        return self.result
+
+    def execute(self, commands: List[Command]) -> None:
+        for command in commands:
+            if isinstance(command, tuple) and command[0] == "repeat":
+                _, count, body = command
+                while count != 0:
+                    self.execute(body)
+                    count -= 1
+            elif isinstance(command, tuple):
+                _, condition, body = command
+                while self.condition(*condition):
+                    self.execute(body)
+                    # "while out <> 75 { eval }" waits for a key on the GUI
+                    if self.only_evaluates(body) and self.condition(*condition):
+                        raise Unsupported(f"waits for input: while {' '.join(condition)}")
+            else:
+                self.execute_command(command)
+
+    def execute_command(self, words: List[str]) -> None:
+        name, arguments = words[0], words[1:]
+        if name == "load":
+            hdl_path = self.directory / arguments[0]
+            self.chip = self.load_chip(hdl_path)
+            if self.chip is None:
+                raise Unsupported(f"no model for {hdl_path.name}")
+        elif name == "output-file":
+            self.result.output_path = self.directory / arguments[0]
+        elif name == "compare-to":
+            with open(self.directory / arguments[0], "r") as f:
+                self.compare_lines = [line.rstrip("\r\n") for line in f]
+        elif name == "output-list":
+            self.columns = [OutputColumn.parse(argument) for argument in arguments]
+            self.emit("|" + "|".join(column.header() for column in self.columns) + "|")
+        elif name == "output":
+            self.emit("|" + "|".join(column.format(self.value(column.name)) for column in self.columns) + "|")
+        elif name == "set":
+            self.chip.set(arguments[0], parse_value(arguments[1]))
+        elif name == "eval":
+            self.chip.eval()
+        elif name == "tick":
+            self.chip.tick()
+            self.after_tick = True
+        elif name == "tock":
+            self.chip.tock()
+            self.time += 1
+            self.after_tick = False
+        elif name == "ticktock":
+            self.execute_command(["tick"])
+            self.execute_command(["tock"])
+        elif name in ("echo", "clear-echo", "breakpoint", "clear-breakpoints"):
+            pass
+        elif len(arguments) == 2 and arguments[0] == "load":
+            self.chip.load(name, self.directory / arguments[1])
+        else:
+            raise RuntimeError(f"Unsupported command {' '.join(words)}")
+
+    @staticmethod
+    def only_evaluates(commands: List[Command]) -> bool:
+        return all(
+            isinstance(command, list) and command[0] in ("eval", "output", "echo") for command in commands
+        )
+
+    def condition(self, name: str, operator: str, text: str) -> bool:
+        value = to_signed(self.chip.get(name))
+        expected = to_signed(parse_value(text))
+        return _CONDITIONS[operator](value, expected)
+
+    def value(self, name: str) -> Union[int, str]:
+        if name == "time":
+            return f"{self.time}+" if self.after_tick else str(self.time)
+        return self.chip.get(name)
+
+    def emit(self, line: str) -> None:
+        self.result.output.append(line)
+        if self.compare_lines is None:
+            return
+        line_number = len(self.result.output)
+        expected = self.compare_lines[line_number - 1] if line_number <= len(self.compare_lines) else None
+        if expected is None or not lines_match(line, expected):
+            self.result.mismatch = f"line {line_number}: expected {expected!r}, got {line!r}"
+            raise _ComparisonFailure()
+        self.result.compared += 1
+
+
+# "*" in the compare file matches any character
+def lines_match(line: str, expected: str) -> bool:
+    return len(line) == len(expected) and all(
+        wanted == "*" or got == wanted for got, wanted in zip(line, expected)
+    )
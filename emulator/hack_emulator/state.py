@@ -0,0 +1,88 @@
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from typing import Tuple
+
+from hack_emulator.computer import RAM_SIZE, Computer
+
+MAGIC = b"HSTA"
+VERSION = 1
+
+# magic, version, ROM id, A, D, PC, halted, cycles, stored RAM words
+_HEADER = struct.Struct("<4sH20sHHHBQI")
+
+
+# SHA-1 of the ROM words, little-endian; a state only fits the ROM it was
+# saved from
+def rom_id(rom: array) -> bytes:
+    words = array("H", rom)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return hashlib.sha1(words.tobytes()).digest()
+
+
+# Header followed by RAM as little-endian words. Trailing zero words are not
+# stored, so small programs give small files.
+def save_state(computer: Computer, file_path) -> None:
+    ram = array("H", computer.ram)
+    if sys.byteorder == "big":
+        ram.byteswap()
+    data = ram.tobytes().rstrip(b"\0")
+    data += b"\0" * (len(data) % 2)
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        rom_id(computer.rom),
+        computer.a,
+        computer.d,
+        computer.pc,
+        computer.halted,
+        computer.cycles,
+        len(data) // 2,
+    )
+    with open(file_path, "wb") as f:
+        f.write(header)
+        f.write(data)
+
+
+def _unpack_header(data) -> Tuple:
+    if len(data) < _HEADER.size:
+        raise RuntimeError("Not a Hack machine state.")
+    fields = _HEADER.unpack_from(data)
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        raise RuntimeError("Not a Hack machine state.")
+    return fields
+
+
+# (ROM id, cycles) without touching the RAM image
+def peek_state(file_path) -> Tuple[bytes, int]:
+    with open(file_path, "rb") as f:
+        fields = _unpack_header(f.read(_HEADER.size))
+    return fields[2], fields[7]
+
+
+# The file is memory-mapped and its RAM image copied straight into the
+# machine's RAM in one go; words that were not stored are zeroed.
+def load_state(computer: Computer, file_path) -> None:
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        _, _, saved_rom_id, a, d, pc, halted, cycles, words = _unpack_header(mapped)
+        if saved_rom_id != rom_id(computer.rom):
+            raise RuntimeError(f"{file_path} was saved from a different ROM.")
+        if words > RAM_SIZE or len(mapped) != _HEADER.size + 2 * words:
+            raise RuntimeError(f"{file_path} is truncated or corrupt.")
+
+        ram = memoryview(computer.ram).cast("B")
+        image = memoryview(mapped)[_HEADER.size:]
+        ram[:2 * words] = image
+        ram[2 * words:] = bytes(len(ram) - 2 * words)
+        # views must be gone before the mapping is closed
+        image.release()
+        ram.release()
+
+    if sys.byteorder == "big":
+        computer.ram.byteswap()
+    computer.a, computer.d, computer.pc = a, d, pc
+    computer.halted = bool(halted)
+    computer.cycles = cycles
@@ -0,0 +1,4 @@
+from hack_hdl.netlist import Netlist
+from hack_hdl.parser import ChipDefinition, parse_hdl, read_hdl
+from hack_hdl.plan import Plan, PlanCache, build_plan
+from hack_hdl.simulator import HDLChip, HDLChipLoader
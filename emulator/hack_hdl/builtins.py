@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+GATE = "gate"
+REGISTER = "register"
+MEMORY = "memory"
+
+
+# A chip the simulator implements itself. Outputs are Python expression
+# templates over the input pins ({a}), earlier outputs of the same chip,
+# and for clocked chips {state} (a register's value) or {memory} (a
+# memory's word array). They are pasted into the compiled plan.
+@dataclass
+class BuiltinChip:
+    name: str
+    inputs: Dict[str, int]
+    outputs: Dict[str, int]
+    expressions: Dict[str, str]
+    kind: str = GATE
+    # inputs that the outputs depend on within a clock cycle; for registers
+    # the outputs only depend on the state
+    combinational: Tuple[str, ...] = ()
+    # register value after the next clock cycle
+    next_state: Optional[str] = None
+    memory_size: int = 0
+    # memories written on the clock when load is set
+    writable: bool = False
+    # expressions that differ when every pin holds a NumPy array of test
+    # vectors instead of an int
+    vector: Dict[str, str] = field(default_factory=dict)
+    pins: List[str] = field(init=False)
+
+    def __post_init__(self):
+        if self.kind == GATE:
+            self.combinational = tuple(self.inputs)
+        self.pins = list(self.inputs) + list(self.outputs)
+
+    def width(self, pin: str) -> int:
+        if pin in self.inputs:
+            return self.inputs[pin]
+        return self.outputs[pin]
+
+
+def alu(x: int, y: int, zx: int, nx: int, zy: int, ny: int, f: int, no: int) -> int:
+    if zx:
+        x = 0
+    if nx:
+        x ^= 0xFFFF
+    if zy:
+        y = 0
+    if ny:
+        y ^= 0xFFFF
+    out = (x + y) & 0xFFFF if f else x & y
+    return out ^ 0xFFFF if no else out
+
+
+# names the plan's expressions may use
+RUNTIME = {"alu": alu}
+
+_WAYS = "abcdefgh"
+
+
+def _gate(
+    name: str,
+    inputs: Dict[str, int],
+    outputs: Dict[str, int],
+    vector: Optional[Dict[str, str]] = None,
+    **expressions: str,
+) -> BuiltinChip:
+    return BuiltinChip(name, inputs, outputs, dict(expressions), vector=vector or {})
+
+
+def _mux_way(ways: int, select_width: int) -> BuiltinChip:
+    names = _WAYS[:ways]
+    inputs = {name: 16 for name in names}
+    inputs["sel"] = select_width
+    choices = ", ".join(f"{{{name}}}" for name in names)
+    return _gate(
+        f"Mux{ways}Way16",
+        inputs,
+        {"out": 16},
+        {"out": f"choose({{sel}}, ({choices}))"},
+        out=f"({choices})[{{sel}}]",
+    )
+
+
+def _dmux_way(ways: int, select_width: int) -> BuiltinChip:
+    outputs = {name: 1 for name in _WAYS[:ways]}
+    expressions = {name: f"({{in}} if {{sel}} == {way} else 0)" for way, name in enumerate(_WAYS[:ways])}
+    vector = {name: f"{{in}} * ({{sel}} == {way})" for way, name in enumerate(_WAYS[:ways])}
+    return BuiltinChip(f"DMux{ways}Way", {"in": 1, "sel": select_width}, outputs, expressions, vector=vector)
+
+
+def _register(name: str, width: int, inputs: Dict[str, int], next_state: str) -> BuiltinChip:
+    return BuiltinChip(
+        name, inputs, {"out": width}, {"out": "{state}"}, kind=REGISTER, next_state=next_state
+    )
+
+
+def _ram(name: str, address_width: int) -> BuiltinChip:
+    return BuiltinChip(
+        name,
+        {"in": 16, "load": 1, "address": address_width},
+        {"out": 16},
+        {"out": "{memory}[{address}]"},
+        kind=MEMORY,
+        combinational=("address",),
+        memory_size=1 << address_width,
+        writable=True,
+    )
+
+
+_LOADED = "({in} if {load} else {state})"
+_SELECT = {"out": "where({sel}, {b}, {a})"}
+
+BUILTIN_CHIPS: Dict[str, BuiltinChip] = {
+    chip.name: chip
+    for chip in [
+        _gate("Nand", {"a": 1, "b": 1}, {"out": 1}, out="1 ^ ({a} & {b})"),
+        _gate("Not", {"in": 1}, {"out": 1}, out="1 ^ {in}"),
+        _gate("And", {"a": 1, "b": 1}, {"out": 1}, out="{a} & {b}"),
+        _gate("Or", {"a": 1, "b": 1}, {"out": 1}, out="{a} | {b}"),
+        _gate("Xor", {"a": 1, "b": 1}, {"out": 1}, out="{a} ^ {b}"),
+        _gate("Mux", {"a": 1, "b": 1, "sel": 1}, {"out": 1}, _SELECT, out="({b} if {sel} else {a})"),
+        _gate(
+            "DMux",
+            {"in": 1, "sel": 1},
+            {"a": 1, "b": 1},
+            {"a": "{in} & (1 ^ {sel})", "b": "{in} & {sel}"},
+            a="(0 if {sel} else {in})",
+            b="({in} if {sel} else 0)",
+        ),
+        _gate("Not16", {"in": 16}, {"out": 16}, out="{in} ^ 0xFFFF"),
+        _gate("And16", {"a": 16, "b": 16}, {"out": 16}, out="{a} & {b}"),
+        _gate("Or16", {"a": 16, "b": 16}, {"out": 16}, out="{a} | {b}"),
+        _gate("Mux16", {"a": 16, "b": 16, "sel": 1}, {"out": 16}, _SELECT, out="({b} if {sel} else {a})"),
+        _gate("Or8Way", {"in": 8}, {"out": 1}, {"out": "where({in}, 1, 0)"}, out="(1 if {in} else 0)"),
+        _mux_way(4, 2),
+        _mux_way(8, 3),
+        _dmux_way(4, 2),
+        _dmux_way(8, 3),
+        _gate("HalfAdder", {"a": 1, "b": 1}, {"sum": 1, "carry": 1}, sum="{a} ^ {b}", carry="{a} & {b}"),
+        _gate(
+            "FullAdder",
+            {"a": 1, "b": 1, "c": 1},
+            {"sum": 1, "carry": 1},
+            sum="{a} ^ {b} ^ {c}",
+            carry="({a} + {b} + {c}) >> 1",
+        ),
+        _gate("Add16", {"a": 16, "b": 16}, {"out": 16}, out="({a} + {b}) & 0xFFFF"),
+        _gate("Inc16", {"in": 16}, {"out": 16}, out="({in} + 1) & 0xFFFF"),
+        _gate(
+            "ALU",
+            {"x": 16, "y": 16, "zx": 1, "nx": 1, "zy": 1, "ny": 1, "f": 1, "no": 1},
+            {"out": 16, "zr": 1, "ng": 1},
+            {"zr": "where({out} == 0, 1, 0)"},
+            out="alu({x}, {y}, {zx}, {nx}, {zy}, {ny}, {f}, {no})",
+            zr="(1 if {out} == 0 else 0)",
+            ng="{out} >> 15",
+        ),
+        _register("DFF", 1, {"in": 1}, "{in}"),
+        _register("Bit", 1, {"in": 1, "load": 1}, _LOADED),
+        _register("Register", 16, {"in": 16, "load": 1}, _LOADED),
+        _register("ARegister", 16, {"in": 16, "load": 1}, _LOADED),
+        _register("DRegister", 16, {"in": 16, "load": 1}, _LOADED),
+        _register(
+            "PC",
+            16,
+            {"in": 16, "load": 1, "inc": 1, "reset": 1},
+            "(0 if {reset} else {in} if {load} else ({state} + 1) & 0xFFFF if {inc} else {state})",
+        ),
+        _ram("RAM8", 3),
+        _ram("RAM64", 6),
+        _ram("RAM512", 9),
+        _ram("RAM4K", 12),
+        _ram("RAM16K", 14),
+        _ram("Screen", 13),
+        BuiltinChip(
+            "ROM32K",
+            {"address": 15},
+            {"out": 16},
+            {"out": "{memory}[{address}]"},
+            kind=MEMORY,
+            combinational=("address",),
+            memory_size=1 << 15,
+        ),
+        # the key currently pressed; scripts set it through the Keyboard[] probe
+        BuiltinChip(
+            "Keyboard", {}, {"out": 16}, {"out": "{memory}[0]"}, kind=MEMORY, memory_size=1
+        ),
+    ]
+}
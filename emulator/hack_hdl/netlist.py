@@ -0,0 +1,192 @@
+import pathlib
+from typing import Dict, List, Optional, Tuple, Union
+
+from hack_hdl.builtins import BUILTIN_CHIPS, BuiltinChip
+from hack_hdl.parser import ChipDefinition, Connection, read_hdl
+
+# Where a bit comes from once all aliases are followed:
+# ("const", value), ("input", pin, bit) or ("output", instance id, pin, bit)
+Source = Tuple
+
+
+# One bit of a pin in the chip hierarchy. Connecting pins makes wires point
+# at each other; flattening ends with every wire leading to a Source.
+class Wire:
+
+    __slots__ = ("source",)
+
+    def __init__(self, source: Union["Wire", Source, None] = None):
+        self.source = source
+
+
+FALSE = ("const", 0)
+TRUE = ("const", 1)
+
+
+# a builtin chip in the flattened netlist
+class Instance:
+
+    def __init__(self, instance_id: int, chip: BuiltinChip, path: str):
+        self.instance_id = instance_id
+        self.chip = chip
+        # e.g. "Computer/CPU/ARegister"
+        self.path = path
+        self.inputs: Dict[str, List[Wire]] = {}
+
+
+# .hdl files are looked up next to the chip under test; chips without one
+# are builtins, like in the reference simulator
+class ChipLibrary:
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        self.definitions: Dict[str, Union[ChipDefinition, BuiltinChip]] = {}
+        self.hdl_paths: List[pathlib.Path] = []
+
+    def get(self, name: str) -> Union[ChipDefinition, BuiltinChip]:
+        chip = self.definitions.get(name)
+        if chip is not None:
+            return chip
+        hdl_path = self.directory / f"{name}.hdl"
+        if hdl_path.exists():
+            chip = read_hdl(hdl_path)
+            self.hdl_paths.append(hdl_path)
+            if chip.builtin is not None:
+                chip = self.builtin(chip.builtin)
+        else:
+            chip = self.builtin(name)
+        self.definitions[name] = chip
+        return chip
+
+    def builtin(self, name: str) -> BuiltinChip:
+        if name not in BUILTIN_CHIPS:
+            raise RuntimeError(f"No {name}.hdl in {self.directory} and no builtin chip {name}")
+        return BUILTIN_CHIPS[name]
+
+
+def _pin_width(chip: Union[ChipDefinition, BuiltinChip], pin: str) -> Optional[int]:
+    if isinstance(chip, BuiltinChip):
+        return chip.width(pin) if pin in chip.pins else None
+    for declaration in chip.inputs + chip.outputs:
+        if declaration.name == pin:
+            return declaration.width
+    return None
+
+
+def _is_output(chip: Union[ChipDefinition, BuiltinChip], pin: str) -> bool:
+    if isinstance(chip, BuiltinChip):
+        return pin in chip.outputs
+    return any(declaration.name == pin for declaration in chip.outputs)
+
+
+class Netlist:
+
+    def __init__(self, library: ChipLibrary, top: ChipDefinition):
+        self.library = library
+        self.top = top
+        self.instances: List[Instance] = []
+        self.outputs: Dict[str, List[Wire]] = {}
+
+    @classmethod
+    def flatten(cls, hdl_path: pathlib.Path) -> "Netlist":
+        library = ChipLibrary(hdl_path.parent)
+        top = library.get(hdl_path.stem)
+        if isinstance(top, BuiltinChip):
+            raise RuntimeError(f"{hdl_path} is a builtin chip")
+        netlist = cls(library, top)
+
+        pins: Dict[str, List[Wire]] = {}
+        for declaration in top.inputs:
+            pins[declaration.name] = [
+                Wire(("input", declaration.name, bit)) for bit in range(declaration.width)
+            ]
+        for declaration in top.outputs:
+            pins[declaration.name] = [Wire() for _ in range(declaration.width)]
+            netlist.outputs[declaration.name] = pins[declaration.name]
+        netlist.instantiate(top, pins, top.name)
+        return netlist
+
+    def instantiate(self, chip: ChipDefinition, pins: Dict[str, List[Wire]], path: str) -> None:
+        wires = dict(pins)
+        inputs = {declaration.name for declaration in chip.inputs}
+
+        def chip_side(connection: Connection, width: int, is_output: bool) -> List[Wire]:
+            name = connection.chip_pin
+            if name in ("true", "false"):
+                if is_output:
+                    raise RuntimeError(f"{path}: cannot connect an output to {name}")
+                return [Wire(TRUE if name == "true" else FALSE) for _ in range(width)]
+            if name not in wires:
+                if connection.chip_range is not None:
+                    raise RuntimeError(f"{path}: sub-bus of internal pin {name}")
+                wires[name] = [Wire() for _ in range(width)]
+            if is_output and name in inputs:
+                raise RuntimeError(f"{path}: cannot drive input pin {name}")
+            low, high = connection.chip_range or (0, len(wires[name]) - 1)
+            selected = wires[name][low:high + 1]
+            if len(selected) != width:
+                raise RuntimeError(
+                    f"{path}: {connection.part_pin} is {width} bits wide, {name} is {len(selected)}"
+                )
+            return selected
+
+        for part in chip.parts:
+            part_chip = self.library.get(part.chip_name)
+            part_path = f"{path}/{part.chip_name}"
+            part_pins: Dict[str, List[Wire]] = {}
+            for connection in part.connections:
+                width = _pin_width(part_chip, connection.part_pin)
+                if width is None:
+                    raise RuntimeError(
+                        f"line {part.line_number}: {part.chip_name} has no pin {connection.part_pin}"
+                    )
+                is_output = _is_output(part_chip, connection.part_pin)
+                if connection.part_pin not in part_pins:
+                    part_pins[connection.part_pin] = [
+                        Wire(None if is_output else FALSE) for _ in range(width)
+                    ]
+                low, high = connection.part_range or (0, width - 1)
+                part_wires = part_pins[connection.part_pin]
+
+                if is_output:
+                    targets = chip_side(connection, high - low + 1, True)
+                    for target, wire in zip(targets, part_wires[low:high + 1]):
+                        if target.source is not None:
+                            raise RuntimeError(f"{path}: {connection.chip_pin} has more than one driver")
+                        target.source = wire
+                else:
+                    part_wires[low:high + 1] = chip_side(connection, high - low + 1, False)
+
+            if isinstance(part_chip, BuiltinChip):
+                self.add_instance(part_chip, part_pins, part_path)
+            else:
+                for declaration in part_chip.inputs:
+                    if declaration.name not in part_pins:
+                        part_pins[declaration.name] = [Wire(FALSE) for _ in range(declaration.width)]
+                for declaration in part_chip.outputs:
+                    if declaration.name not in part_pins:
+                        part_pins[declaration.name] = [Wire() for _ in range(declaration.width)]
+                self.instantiate(part_chip, part_pins, part_path)
+
+    def add_instance(self, chip: BuiltinChip, pins: Dict[str, List[Wire]], path: str) -> None:
+        instance = Instance(len(self.instances), chip, path)
+        for pin, width in chip.inputs.items():
+            instance.inputs[pin] = pins.get(pin) or [Wire(FALSE) for _ in range(width)]
+        for pin, width in chip.outputs.items():
+            for bit, wire in enumerate(pins.get(pin, [])):
+                wire.source = ("output", instance.instance_id, pin, bit)
+        self.instances.append(instance)
+
+
+# follows aliases to the Source of a wire; wires nothing drives read as 0
+def resolve(wire: Wire) -> Source:
+    chain = []
+    source = wire
+    while isinstance(source, Wire):
+        chain.append(source)
+        source = source.source
+    if source is None:
+        source = FALSE
+    for alias in chain:
+        alias.source = source
+    return source
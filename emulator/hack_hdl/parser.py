@@ -0,0 +1,157 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+_TOKEN = re.compile(r"[A-Za-z_][\w]*|\d+|\.\.|[{}()\[\],;=:]")
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# inclusive bit range of a sub-bus, e.g. out[0..14] -> (0, 14)
+BitRange = Tuple[int, int]
+
+
+@dataclass
+class PinDeclaration:
+    name: str
+    width: int = 1
+
+
+@dataclass
+class Connection:
+    part_pin: str
+    part_range: Optional[BitRange]
+    # pin of the enclosing chip, an internal pin, "true" or "false"
+    chip_pin: str
+    chip_range: Optional[BitRange]
+
+
+@dataclass
+class Part:
+    chip_name: str
+    connections: List[Connection]
+    line_number: int
+
+
+@dataclass
+class ChipDefinition:
+    name: str
+    inputs: List[PinDeclaration] = field(default_factory=list)
+    outputs: List[PinDeclaration] = field(default_factory=list)
+    parts: List[Part] = field(default_factory=list)
+    # "BUILTIN Name;" chips delegate to the simulator's own implementation
+    builtin: Optional[str] = None
+    clocked: List[str] = field(default_factory=list)
+
+
+class _Tokens:
+
+    def __init__(self, text: str):
+        self.tokens: List[Tuple[str, int]] = []
+        text = _COMMENT.sub(lambda match: "\n" * match.group(0).count("\n"), text)
+        for line_number, line in enumerate(text.split("\n"), 1):
+            self.tokens.extend((token, line_number) for token in _TOKEN.findall(line))
+        self.position = 0
+
+    @property
+    def line_number(self) -> int:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][1]
+        return self.tokens[-1][1] if self.tokens else 0
+
+    def peek(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+        return None
+
+    def next(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise RuntimeError("Unexpected end of HDL file.")
+        self.position += 1
+        return token
+
+    def expect(self, expected: str) -> None:
+        line_number = self.line_number
+        token = self.next()
+        if token != expected:
+            raise RuntimeError(f"line {line_number}: expected '{expected}', got '{token}'")
+
+    def accept(self, expected: str) -> bool:
+        if self.peek() == expected:
+            self.position += 1
+            return True
+        return False
+
+
+def _parse_range(tokens: _Tokens) -> Optional[BitRange]:
+    if not tokens.accept("["):
+        return None
+    low = int(tokens.next())
+    high = low
+    if tokens.accept(".."):
+        high = int(tokens.next())
+    tokens.expect("]")
+    return low, high
+
+
+def _parse_declarations(tokens: _Tokens) -> List[PinDeclaration]:
+    declarations: List[PinDeclaration] = []
+    while True:
+        name = tokens.next()
+        width = 1
+        if tokens.accept("["):
+            width = int(tokens.next())
+            tokens.expect("]")
+        declarations.append(PinDeclaration(name, width))
+        if tokens.accept(";"):
+            return declarations
+        tokens.expect(",")
+
+
+def _parse_part(tokens: _Tokens) -> Part:
+    line_number = tokens.line_number
+    chip_name = tokens.next()
+    tokens.expect("(")
+    connections: List[Connection] = []
+    while True:
+        part_pin = tokens.next()
+        part_range = _parse_range(tokens)
+        tokens.expect("=")
+        chip_pin = tokens.next()
+        chip_range = _parse_range(tokens)
+        connections.append(Connection(part_pin, part_range, chip_pin, chip_range))
+        if tokens.accept(")"):
+            break
+        tokens.expect(",")
+    tokens.expect(";")
+    return Part(chip_name, connections, line_number)
+
+
+def parse_hdl(text: str) -> ChipDefinition:
+    tokens = _Tokens(text)
+    tokens.expect("CHIP")
+    chip = ChipDefinition(tokens.next())
+    tokens.expect("{")
+    while not tokens.accept("}"):
+        line_number = tokens.line_number
+        keyword = tokens.next()
+        if keyword == "IN":
+            chip.inputs.extend(_parse_declarations(tokens))
+        elif keyword == "OUT":
+            chip.outputs.extend(_parse_declarations(tokens))
+        elif keyword == "PARTS":
+            tokens.expect(":")
+            while tokens.peek() not in ("}", "BUILTIN", "CLOCKED", None):
+                chip.parts.append(_parse_part(tokens))
+        elif keyword == "BUILTIN":
+            chip.builtin = tokens.next()
+            tokens.expect(";")
+        elif keyword == "CLOCKED":
+            chip.clocked.extend(declaration.name for declaration in _parse_declarations(tokens))
+        else:
+            raise RuntimeError(f"line {line_number}: unexpected '{keyword}' in chip {chip.name}")
+    return chip
+
+
+def read_hdl(file_path) -> ChipDefinition:
+    with open(file_path, "r") as f:
+        return parse_hdl(f.read())
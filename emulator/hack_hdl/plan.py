@@ -0,0 +1,309 @@
+import collections
+import hashlib
+import json
+import os
+import pathlib
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from hack_hdl.builtins import MEMORY, REGISTER, RUNTIME
+from hack_hdl.netlist import Instance, Netlist, Source, resolve
+
+# bump when the generated code changes, so cached plans are rebuilt
+PLAN_VERSION = 1
+
+_SIMPLE = re.compile(r"^\w+$")
+
+# (name, width) of a top-level pin; (chip name, instance path, size) of a
+# register (size = width) or memory (size = words)
+Pin = Tuple[str, int]
+Part = Tuple[str, str, int]
+
+
+# A chip compiled for simulation: its flattened netlist as one generated
+# Python function that evaluates every builtin part in topological order.
+#   evaluate(inputs, state, memory) -> (outputs, next_state, writes)
+# inputs, outputs: top-level pin values in declaration order
+# state, next_state: register values now and after the next clock
+# memory: one word array per memory; writes: (load, address, in) of each
+#   writable memory, applied on the clock
+class Plan:
+
+    def __init__(
+        self,
+        name: str,
+        inputs: List[Pin],
+        outputs: List[Pin],
+        registers: List[Part],
+        memories: List[Part],
+        writable: List[int],
+        source: str,
+        runtime: Optional[Dict[str, object]] = None,
+    ):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.registers = registers
+        self.memories = memories
+        # indexes into memories of the memories that writes refers to
+        self.writable = writable
+        self.source = source
+        namespace: Dict[str, object] = dict(RUNTIME if runtime is None else runtime)
+        exec(compile(source, f"<plan {name}>", "exec"), namespace)
+        self.evaluate: Callable = namespace["evaluate"]
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "registers": self.registers,
+            "memories": self.memories,
+            "writable": self.writable,
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Plan":
+        return cls(
+            data["name"],
+            [tuple(pin) for pin in data["inputs"]],
+            [tuple(pin) for pin in data["outputs"]],
+            [tuple(part) for part in data["registers"]],
+            [tuple(part) for part in data["memories"]],
+            data["writable"],
+            data["source"],
+        )
+
+
+def _variable(source: Source) -> str:
+    if source[0] == "input":
+        return f"i_{source[1]}"
+    return f"v{source[1]}_{source[2]}"
+
+
+# Python expression for a bus given its bits, least significant first. Runs
+# of consecutive bits of one signal become a single shift and mask.
+def _bus_expression(bits: List[Source], widths: Dict[str, int]) -> str:
+    terms: List[str] = []
+    constant = 0
+    position = 0
+    while position < len(bits):
+        source = bits[position]
+        if source[0] == "const":
+            constant |= source[1] << position
+            position += 1
+            continue
+        variable = _variable(source)
+        first_bit = source[-1]
+        end = position + 1
+        while (
+            end < len(bits)
+            and bits[end][0] != "const"
+            and _variable(bits[end]) == variable
+            and bits[end][-1] == first_bit + end - position
+        ):
+            end += 1
+
+        length = end - position
+        term = variable
+        if first_bit:
+            term = f"({term} >> {first_bit})"
+        if first_bit + length < widths[variable]:
+            term = f"({term} & {(1 << length) - 1})"
+        if position:
+            term = f"({term} << {position})"
+        terms.append(term)
+        position = end
+    if constant or not terms:
+        terms.append(str(constant))
+    return " | ".join(terms)
+
+
+def _dependencies(instance: Instance, pins) -> Set[int]:
+    return {
+        source[1]
+        for pin in pins
+        for source in map(resolve, instance.inputs[pin])
+        if source[0] == "output"
+    }
+
+
+# parts the outputs, registers and memories need, in evaluation order
+def _evaluation_order(netlist: Netlist) -> List[Instance]:
+    instances = netlist.instances
+    needed: Set[int] = set()
+    pending = [
+        instance.instance_id for instance in instances if instance.chip.kind in (REGISTER, MEMORY)
+    ]
+    pending.extend(
+        source[1]
+        for wires in netlist.outputs.values()
+        for source in map(resolve, wires)
+        if source[0] == "output"
+    )
+    while pending:
+        instance_id = pending.pop()
+        if instance_id in needed:
+            continue
+        needed.add(instance_id)
+        pending.extend(_dependencies(instances[instance_id], instances[instance_id].chip.inputs))
+
+    # Kahn's algorithm over combinational inputs only: register outputs do
+    # not depend on their inputs within a cycle, which breaks feedback loops
+    depends_on = {
+        instance_id: _dependencies(instances[instance_id], instances[instance_id].chip.combinational)
+        for instance_id in needed
+    }
+    users: Dict[int, List[int]] = collections.defaultdict(list)
+    for instance_id, dependencies in depends_on.items():
+        for dependency in dependencies:
+            users[dependency].append(instance_id)
+    remaining = {instance_id: len(dependencies) for instance_id, dependencies in depends_on.items()}
+    ready = collections.deque(sorted(instance_id for instance_id, count in remaining.items() if count == 0))
+
+    order: List[Instance] = []
+    while ready:
+        instance_id = ready.popleft()
+        order.append(instances[instance_id])
+        for user in users[instance_id]:
+            remaining[user] -= 1
+            if remaining[user] == 0:
+                ready.append(user)
+    if len(order) != len(needed):
+        looped = sorted(instances[i].path for i, count in remaining.items() if count > 0)
+        raise RuntimeError(f"Combinational loop through {', '.join(looped[:5])}")
+    return order
+
+
+# With vector set, the plan uses each builtin's vector expressions and
+# evaluates with the given runtime, so every pin can carry a NumPy array
+def build_plan(netlist: Netlist, vector: bool = False, runtime: Optional[Dict[str, object]] = None) -> Plan:
+    top = netlist.top
+    inputs = [(declaration.name, declaration.width) for declaration in top.inputs]
+    outputs = [(declaration.name, declaration.width) for declaration in top.outputs]
+    widths: Dict[str, int] = {f"i_{name}": width for name, width in inputs}
+    for instance in netlist.instances:
+        for pin, width in instance.chip.outputs.items():
+            widths[f"v{instance.instance_id}_{pin}"] = width
+
+    registers = [instance for instance in netlist.instances if instance.chip.kind == REGISTER]
+    memories = [instance for instance in netlist.instances if instance.chip.kind == MEMORY]
+    register_index = {instance.instance_id: index for index, instance in enumerate(registers)}
+    memory_index = {instance.instance_id: index for index, instance in enumerate(memories)}
+
+    lines = ["def evaluate(inputs, state, memory):"]
+    for index, (name, _) in enumerate(inputs):
+        lines.append(f"    i_{name} = inputs[{index}]")
+    for index in range(len(registers)):
+        lines.append(f"    s{index} = state[{index}]")
+    for index in range(len(memories)):
+        lines.append(f"    m{index} = memory[{index}]")
+
+    def bind(instance: Instance, pins) -> Dict[str, str]:
+        bound = {}
+        for pin in pins:
+            expression = _bus_expression([resolve(wire) for wire in instance.inputs[pin]], widths)
+            if not _SIMPLE.match(expression):
+                name = f"a{instance.instance_id}_{pin}"
+                lines.append(f"    {name} = {expression}")
+                expression = name
+            bound[pin] = expression
+        return bound
+
+    for instance in _evaluation_order(netlist):
+        chip = instance.chip
+        names = bind(instance, chip.combinational)
+        if instance.instance_id in register_index:
+            names["state"] = f"s{register_index[instance.instance_id]}"
+        if instance.instance_id in memory_index:
+            names["memory"] = f"m{memory_index[instance.instance_id]}"
+        for pin, expression in chip.expressions.items():
+            if vector:
+                expression = chip.vector.get(pin, expression)
+            variable = f"v{instance.instance_id}_{pin}"
+            lines.append(f"    {variable} = {expression.format_map(names)}")
+            names[pin] = variable
+
+    next_state = []
+    for index, instance in enumerate(registers):
+        names = bind(instance, instance.chip.inputs)
+        names["state"] = f"s{index}"
+        next_state.append(instance.chip.next_state.format_map(names))
+
+    writable = [index for index, instance in enumerate(memories) if instance.chip.writable]
+    writes = []
+    for index in writable:
+        names = bind(memories[index], memories[index].chip.inputs)
+        writes.append(f"({names['load']}, {names['address']}, {names['in']})")
+
+    output_expressions = [
+        _bus_expression([resolve(wire) for wire in netlist.outputs[name]], widths) for name, _ in outputs
+    ]
+    lines.append(
+        "    return ("
+        + "".join(f"({expression}), " for expression in output_expressions)
+        + "), ("
+        + "".join(f"{expression}, " for expression in next_state)
+        + "), ("
+        + "".join(f"{expression}, " for expression in writes)
+        + ")"
+    )
+
+    return Plan(
+        top.name,
+        inputs,
+        outputs,
+        [(instance.chip.name, instance.path, instance.chip.outputs["out"]) for instance in registers],
+        [(instance.chip.name, instance.path, instance.chip.memory_size) for instance in memories],
+        writable,
+        "\n".join(lines) + "\n",
+        runtime,
+    )
+
+
+# Chips are looked up next to the chip under test, so a plan stays valid
+# while no .hdl file in its directory changes
+def directory_digest(directory: pathlib.Path) -> str:
+    digest = hashlib.sha1(f"plan {PLAN_VERSION}".encode())
+    for hdl_path in sorted(directory.glob("*.hdl")):
+        digest.update(hdl_path.name.encode())
+        digest.update(hdl_path.read_bytes())
+    return digest.hexdigest()
+
+
+class PlanCache:
+
+    def __init__(self, directory: Optional[pathlib.Path]):
+        # None keeps plans in memory only
+        self.directory = directory
+        self.plans: Dict[str, Plan] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, hdl_path: pathlib.Path) -> Tuple[Plan, bool]:
+        key = f"{hdl_path.stem}-{directory_digest(hdl_path.parent)[:16]}"
+        plan = self.plans.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan, True
+
+        plan_path = self.directory / f"{key}.json" if self.directory is not None else None
+        if plan_path is not None and plan_path.exists():
+            with open(plan_path, "r") as f:
+                plan = Plan.from_dict(json.load(f))
+            self.plans[key] = plan
+            self.hits += 1
+            return plan, True
+
+        plan = build_plan(Netlist.flatten(hdl_path))
+        if plan_path is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # workers may build the same plan at once; the rename is atomic
+            temporary_path = plan_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temporary_path, "w") as f:
+                json.dump(plan.to_dict(), f)
+            os.replace(temporary_path, plan_path)
+        self.plans[key] = plan
+        self.misses += 1
+        return plan, False
@@ -0,0 +1,100 @@
+import pathlib
+from array import array
+from typing import List, Optional, Tuple
+
+from hack_emulator.chips import split_pin
+from hack_emulator.loader import load_rom
+from hack_emulator.script import Chip
+from hack_hdl.plan import Plan, PlanCache
+
+
+# A chip simulated from its HDL through a compiled Plan. Like the built-in
+# clocked chips of the reference simulator, tick computes the registers' next
+# values (which the register probes such as PC[] show right away) and the
+# memory writes, and tock commits them.
+class HDLChip(Chip):
+
+    def __init__(self, plan: Plan):
+        self.plan = plan
+        self.input_index = {name: index for index, (name, _) in enumerate(plan.inputs)}
+        self.output_index = {name: index for index, (name, _) in enumerate(plan.outputs)}
+        self.inputs = [0] * len(plan.inputs)
+        self.state = [0] * len(plan.registers)
+        self.next_state = list(self.state)
+        self.memory = [array("H", bytes(2 * size)) for _, _, size in plan.memories]
+        self.writes: Tuple = ()
+        self.outputs: Tuple = ()
+        self.eval()
+
+    # probes such as ARegister[] or RAM16K[5] name the first part of that chip
+    def find_part(self, parts: List[Tuple[str, str, int]], chip_name: str) -> Optional[int]:
+        for index, (name, _, _) in enumerate(parts):
+            if name == chip_name:
+                return index
+        return None
+
+    def set(self, name: str, value: int) -> None:
+        if name in self.input_index:
+            self.inputs[self.input_index[name]] = value
+            return
+        pin, index = split_pin(name)
+        register = self.find_part(self.plan.registers, pin)
+        memory = self.find_part(self.plan.memories, pin)
+        if register is not None:
+            self.state[register] = self.next_state[register] = value
+        elif memory is not None:
+            self.memory[memory][index] = value
+        else:
+            super().set(name, value)
+
+    def get(self, name: str) -> int:
+        if name in self.input_index:
+            return self.inputs[self.input_index[name]]
+        if name in self.output_index:
+            return self.outputs[self.output_index[name]]
+        pin, index = split_pin(name)
+        register = self.find_part(self.plan.registers, pin)
+        memory = self.find_part(self.plan.memories, pin)
+        if register is not None:
+            return self.next_state[register]
+        if memory is not None:
+            return self.memory[memory][index]
+        return super().get(name)
+
+    def eval(self) -> None:
+        self.outputs, _, _ = self.plan.evaluate(self.inputs, self.state, self.memory)
+
+    def tick(self) -> None:
+        self.outputs, next_state, self.writes = self.plan.evaluate(self.inputs, self.state, self.memory)
+        self.next_state = list(next_state)
+
+    def tock(self) -> None:
+        self.state = list(self.next_state)
+        for index, (load, address, value) in zip(self.plan.writable, self.writes):
+            if load:
+                self.memory[index][address] = value
+        self.writes = ()
+        self.eval()
+
+    def load(self, part: str, file_path: pathlib.Path) -> None:
+        memory = self.find_part(self.plan.memories, part)
+        if memory is None:
+            super().load(part, file_path)
+        words = load_rom(file_path)
+        size = self.plan.memories[memory][2]
+        if len(words) > size:
+            raise RuntimeError(f"{file_path} has {len(words)} words, {part} holds {size}")
+        words.extend([0] * (size - len(words)))
+        self.memory[memory] = words
+        self.eval()
+
+
+# chip loader for TestScript that compiles each chip once per cache
+class HDLChipLoader:
+
+    def __init__(self, cache: PlanCache):
+        self.cache = cache
+
+    def __call__(self, hdl_path: pathlib.Path) -> HDLChip:
+        plan, _ = self.cache.load(hdl_path)
+        return HDLChip(plan)
@@ -0,0 +1,109 @@
+import pathlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from hack_hdl.builtins import GATE
+from hack_hdl.netlist import Netlist
+from hack_hdl.plan import Pin, build_plan
+from hack_hdl.reference import REFERENCE_MODELS
+
+# bus values that random sampling picks more often than chance would
+CORNERS = (0, 1, 0x7FFF, 0x8000, 0xFFFE, 0xFFFF)
+
+
+def _alu(x, y, zx, nx, zy, ny, f, no):
+    x = np.where(zx, 0, x)
+    x = np.where(nx, x ^ 0xFFFF, x)
+    y = np.where(zy, 0, y)
+    y = np.where(ny, y ^ 0xFFFF, y)
+    out = np.where(f, (x + y) & 0xFFFF, x & y)
+    return np.where(no, out ^ 0xFFFF, out)
+
+
+VECTOR_RUNTIME = {"alu": _alu, "choose": np.choose, "where": np.where}
+
+
+@dataclass
+class VerifyResult:
+    hdl_path: pathlib.Path
+    vectors: int = 0
+    exhaustive: bool = False
+    # first test vector the chip gets wrong
+    mismatch: Optional[str] = None
+    error: Optional[str] = None
+    skipped: Optional[str] = None
+
+    @property
+    def passed(self) -> bool:
+        return self.mismatch is None and self.error is None and self.skipped is None
+
+
+# Every input combination when the inputs have at most exhaustive_bits bits
+# in total, otherwise samples random vectors with a quarter of the bus values
+# drawn from CORNERS.
+def input_vectors(
+    pins: List[Pin], exhaustive_bits: int, samples: int, rng: np.random.Generator
+) -> Tuple[Dict[str, np.ndarray], bool]:
+    values: Dict[str, np.ndarray] = {}
+    total_bits = sum(width for _, width in pins)
+    if total_bits <= exhaustive_bits:
+        counter = np.arange(1 << total_bits, dtype=np.int64)
+        shift = 0
+        for name, width in pins:
+            values[name] = (counter >> shift) & ((1 << width) - 1)
+            shift += width
+        return values, True
+
+    for name, width in pins:
+        mask = (1 << width) - 1
+        random = rng.integers(0, mask + 1, samples, dtype=np.int64)
+        corners = rng.choice(np.array([corner & mask for corner in CORNERS], dtype=np.int64), samples)
+        values[name] = np.where(rng.random(samples) < 0.25, corners, random)
+    return values, False
+
+
+# Evaluates a flattened combinational chip on many test vectors at once (each
+# pin of the compiled plan carries a NumPy array of them) and compares the
+# outputs to the chip's reference model.
+def verify_chip(
+    hdl_path: pathlib.Path,
+    exhaustive_bits: int = 20,
+    samples: int = 100000,
+    seed: int = 0,
+    chunk_size: int = 1 << 16,
+) -> VerifyResult:
+    result = VerifyResult(hdl_path)
+    model = REFERENCE_MODELS.get(hdl_path.stem)
+    if model is None:
+        result.skipped = f"no reference model for {hdl_path.stem}"
+        return result
+    try:
+        netlist = Netlist.flatten(hdl_path)
+    except RuntimeError as e:
+        result.error = str(e)
+        return result
+    clocked = [instance.path for instance in netlist.instances if instance.chip.kind != GATE]
+    if clocked:
+        result.skipped = f"not combinational: {clocked[0]}"
+        return result
+
+    plan = build_plan(netlist, vector=True, runtime=VECTOR_RUNTIME)
+    values, result.exhaustive = input_vectors(plan.inputs, exhaustive_bits, samples, np.random.default_rng(seed))
+    count = len(values[plan.inputs[0][0]]) if plan.inputs else 1
+    for start in range(0, count, chunk_size):
+        inputs = {name: values[name][start:start + chunk_size] for name, _ in plan.inputs}
+        outputs, _, _ = plan.evaluate([inputs[name] for name, _ in plan.inputs], (), ())
+        expected = model(**inputs)
+        for (name, _), actual in zip(plan.outputs, outputs):
+            wrong = np.flatnonzero(np.broadcast_to(actual, expected[name].shape) != expected[name])
+            if wrong.size:
+                index = wrong[0]
+                pins = ", ".join(f"{pin}={int(inputs[pin][index])}" for pin in inputs)
+                got = int(np.broadcast_to(actual, expected[name].shape)[index])
+                result.mismatch = f"{pins}: {name} expected {int(expected[name][index])}, got {got}"
+                result.vectors = start + index + 1
+                return result
+    result.vectors = count
+    return result
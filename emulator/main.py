@@ -0,0 +1,177 @@
+import argparse
+import pathlib
+import re
+import sys
+import time
+from typing import Tuple
+
+from hack_emulator import BlockComputer, Computer, load_rom, to_signed
+from hack_emulator.keyboard import Replay, TerminalRecorder, read_script, write_script
+from hack_emulator.profiler import (
+    ProfilingComputer,
+    SourceIndex,
+    collapsed_stacks,
+    fold_commands,
+    fold_functions,
+    format_table,
+)
+from hack_emulator.screen import diff_frames, frame_bits, read_image, screen_view, write_image
+from hack_emulator.state import load_state, save_state
+
+RAM_ASSIGNMENT = re.compile(r"^RAM\[(\d+)\]=(-?\d+)$")
+
+ENGINES = {
+    "interpreter": Computer,
+    "blocks": BlockComputer,
+}
+
+
+def parse_assignment(text: str) -> Tuple[int, int]:
+    match = RAM_ASSIGNMENT.match(text)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"expected RAM[address]=value, got {text}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_range(text: str) -> range:
+    start, _, stop = text.partition("-")
+    return range(int(start), int(stop or start) + 1)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Headless Hack computer emulator")
+    arg_parser.add_argument("rom", type=pathlib.Path, help=".hack or .bin ROM image")
+    arg_parser.add_argument("--cycles", type=int, default=10_000_000, help="instruction limit")
+    arg_parser.add_argument(
+        "--set", type=parse_assignment, action="append", default=[], help="RAM[address]=value"
+    )
+    arg_parser.add_argument(
+        "--dump", type=parse_range, action="append", default=[], help="RAM range to print, e.g. 0-15"
+    )
+    arg_parser.add_argument(
+        "--engine",
+        choices=ENGINES.keys(),
+        default="blocks",
+        help="interpret one instruction at a time, or compile and cache basic blocks",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        help="count cycles per function and VM command of this .asm source of the ROM"
+        " (VM commands come from the ROM's .hmap, see the assembler's --source-map)",
+    )
+    arg_parser.add_argument(
+        "--collapsed", type=pathlib.Path, help="write collapsed stacks for flame graphs (with --profile)"
+    )
+    arg_parser.add_argument(
+        "--load-state", type=pathlib.Path, help="start from a machine state saved from the same ROM"
+    )
+    arg_parser.add_argument("--save-state", type=pathlib.Path, help="save the machine state after the run")
+    arg_parser.add_argument("--keys", type=pathlib.Path, help="replay a '<cycle> <key>' input script")
+    arg_parser.add_argument(
+        "--record", type=pathlib.Path, help="record key presses from the terminal into an input script"
+    )
+    arg_parser.add_argument("--top", type=int, default=20, help="rows per profile table")
+    arg_parser.add_argument(
+        "--snapshot", type=int, action="append", default=[], help="dump the screen after this many cycles"
+    )
+    arg_parser.add_argument("--snapshot-dir", type=pathlib.Path, default=pathlib.Path("."))
+    arg_parser.add_argument("--image-format", choices=["png", "pbm"], default="png")
+    arg_parser.add_argument(
+        "--golden", type=pathlib.Path, help="directory of expected snapshots to diff against"
+    )
+    args = arg_parser.parse_args()
+    if args.collapsed is not None and args.profile is None:
+        arg_parser.error("--collapsed requires --profile")
+    if args.keys is not None and args.record is not None:
+        arg_parser.error("--keys and --record are mutually exclusive")
+
+    engine = ProfilingComputer if args.profile is not None else ENGINES[args.engine]
+    computer = engine(load_rom(args.rom))
+    if args.load_state is not None:
+        load_state(computer, args.load_state)
+        print(f"resumed at cycle {computer.cycles} from {args.load_state}")
+    for address, value in args.set:
+        computer.poke(address, value)
+
+    keyboard = TerminalRecorder() if args.record is not None else Replay(
+        read_script(args.keys) if args.keys is not None else []
+    )
+
+    screen = screen_view(computer)
+    snapshots = []
+    executed = 0
+    start = time.perf_counter()
+    # run up to each snapshot point in turn; a halted program keeps its screen
+    for stop in sorted(set(cycle for cycle in args.snapshot if cycle < args.cycles)) + [args.cycles]:
+        if stop > executed and not computer.halted:
+            executed += keyboard.run(computer, stop - executed)
+        if stop != args.cycles or stop in args.snapshot:
+            snapshots.append((stop, frame_bits(screen)))
+    elapsed = time.perf_counter() - start
+    if args.save_state is not None:
+        save_state(computer, args.save_state)
+    if args.record is not None:
+        write_script(args.record, keyboard.events)
+
+    state = "halted" if computer.halted else "stopped"
+    print(
+        f"{state} after {executed} cycles in {elapsed:.3f} s"
+        f" ({executed / elapsed / 1e6:.2f} M instructions/sec)"
+    )
+    print(f"A={computer.a} D={to_signed(computer.d)} PC={computer.pc}")
+    if isinstance(computer, BlockComputer):
+        stats = computer.stats()
+        print(
+            f"{stats['blocks']} blocks compiled in {stats['compile_time'] * 1000:.1f} ms,"
+            f" {stats['block_hits']} block executions"
+            f" ({executed / max(stats['block_hits'], 1):.1f} instructions per block)"
+        )
+    for addresses in args.dump:
+        for address in addresses:
+            print(f"RAM[{address}] = {to_signed(computer.peek(address))}")
+
+    if isinstance(computer, ProfilingComputer):
+        counts = computer.address_counts()
+        source_map_path = args.rom.with_suffix(".hmap")
+        if not source_map_path.exists():
+            print(f"note: no {source_map_path.name}, folding by labels only", file=sys.stderr)
+            source_map_path = None
+        index = SourceIndex.read(args.profile, source_map_path)
+        if len(index) != len(computer.program):
+            # e.g. a peephole-optimized ROM without its .hmap: the counts
+            # would land on the wrong source lines
+            print(
+                f"error: {args.profile} maps {len(index)} instructions, ROM has {len(computer.program)};"
+                " assemble with --source-map to profile optimized ROMs",
+                file=sys.stderr,
+            )
+        else:
+            print()
+            print("\n".join(format_table("function", fold_functions(counts, index), args.top)))
+            print()
+            print("\n".join(format_table("VM command", fold_commands(counts, index), args.top)))
+            if args.collapsed is not None:
+                with open(args.collapsed, "w") as f:
+                    f.writelines(line + "\n" for line in collapsed_stacks(counts, index))
+
+    failed = 0
+    for cycle, bits in snapshots:
+        name = f"{args.rom.stem}-{cycle}.{args.image_format}"
+        args.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        write_image(args.snapshot_dir / name, bits)
+        if args.golden is None:
+            continue
+        golden_path = args.golden / name
+        if not golden_path.exists():
+            print(f"{name}: no golden image {golden_path}")
+            failed += 1
+            continue
+        pixels, box = diff_frames(bits, read_image(golden_path))
+        if pixels:
+            print(f"{name}: {pixels} pixels differ in {box}")
+            failed += 1
+        else:
+            print(f"{name}: matches")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,73 @@
+import argparse
+import functools
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from hack_emulator.chips import load_builtin_chip
+from hack_emulator.script import ScriptResult, TestScript
+from hack_hdl.plan import PlanCache
+from hack_hdl.simulator import HDLChipLoader
+
+
+def expand_inputs(inputs: List[str]) -> List[pathlib.Path]:
+    paths: List[pathlib.Path] = []
+    for name in inputs:
+        path = pathlib.Path(name)
+        if path.is_dir():
+            paths.extend(sorted(path.rglob("*.tst")))
+        else:
+            paths.append(path)
+    return paths
+
+
+# "emulator" runs the CPU and Computer scripts on the emulator; "hdl"
+# simulates any chip from the .hdl files next to its script
+def run_script(script_path: pathlib.Path, engine: str, cache_dir: Optional[pathlib.Path]) -> ScriptResult:
+    if engine == "hdl":
+        return TestScript(script_path, HDLChipLoader(PlanCache(cache_dir))).run()
+    return TestScript(script_path, load_builtin_chip).run()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Run nand2tetris test scripts on the emulator or the HDL simulator"
+    )
+    arg_parser.add_argument("inputs", nargs="+", help=".tst files or directories")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    arg_parser.add_argument(
+        "--write-output", action="store_true", help="write each script's output-file"
+    )
+    arg_parser.add_argument("--engine", choices=["emulator", "hdl"], default="emulator")
+    arg_parser.add_argument(
+        "--cache-dir", default=".hdl_cache", help="compiled HDL plans ('' to disable)"
+    )
+    args = arg_parser.parse_args()
+
+    script_paths = expand_inputs(args.inputs)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        cache_dir = pathlib.Path(args.cache_dir) if args.cache_dir else None
+        runner = functools.partial(run_script, engine=args.engine, cache_dir=cache_dir)
+        results = list(executor.map(runner, script_paths))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for result in results:
+        if result.skipped is not None:
+            print(f"SKIP {result.script_path}: {result.skipped}")
+            continue
+        if result.passed:
+            print(f"PASS {result.script_path}: {result.compared} lines")
+        else:
+            failed += 1
+            print(f"FAIL {result.script_path}: {result.mismatch or result.error}")
+        if args.write_output and result.output_path is not None:
+            with open(result.output_path, "w") as f:
+                f.writelines(line + "\n" for line in result.output)
+
+    print(f"{len(results)} scripts, {failed} failed in {elapsed:.2f} s")
+    if failed:
+        sys.exit(1)
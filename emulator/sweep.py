@@ -0,0 +1,69 @@
+import argparse
+import itertools
+import pathlib
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from hack_emulator import RAM_SIZE, load_rom
+from hack_emulator.batch import BatchComputer
+
+
+# "0=0-99" -> (0, range(0, 100)); "1=-5-5" -> (1, range(-5, 6))
+def parse_vary(text: str) -> Tuple[int, range]:
+    address, _, values = text.partition("=")
+    start, _, stop = values[1:].partition("-")
+    start = values[0] + start
+    return int(address), range(int(start), int(stop or start) + 1)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Run one ROM over every combination of initial RAM values"
+    )
+    arg_parser.add_argument("rom", type=pathlib.Path)
+    arg_parser.add_argument(
+        "--vary",
+        type=parse_vary,
+        action="append",
+        required=True,
+        help="address=first-last, e.g. 0=0-99; several give the cartesian product",
+    )
+    arg_parser.add_argument(
+        "--dump", type=int, action="append", default=[], help="RAM address to report"
+    )
+    arg_parser.add_argument("--cycles", type=int, default=100_000)
+    # every instance has its own RAM row, so large sweeps of programs that
+    # only use low memory can shrink it
+    arg_parser.add_argument(
+        "--ram-size",
+        type=int,
+        default=RAM_SIZE,
+        help=f"RAM words per instance (default: {RAM_SIZE}); the program must not address past it",
+    )
+    args = arg_parser.parse_args()
+
+    addresses: List[int] = [address for address, _ in args.vary]
+    if any(address >= args.ram_size for address in addresses + args.dump):
+        arg_parser.error(f"--vary and --dump addresses must be below --ram-size {args.ram_size}")
+    combinations = np.array(list(itertools.product(*[values for _, values in args.vary])))
+
+    computer = BatchComputer(load_rom(args.rom), len(combinations), args.ram_size)
+    for column, address in enumerate(addresses):
+        computer.set_ram(address, combinations[:, column])
+
+    start = time.perf_counter()
+    steps = computer.run(args.cycles)
+    elapsed = time.perf_counter() - start
+
+    header = [f"RAM[{address}]" for address in addresses + args.dump] + ["cycles"]
+    print("\t".join(header))
+    results = computer.ram[:, args.dump].view(np.int16)
+    for inputs, outputs, cycles in zip(combinations, results, computer.cycles):
+        print("\t".join(str(value) for value in [*inputs, *outputs, cycles]))
+
+    print(
+        f"{len(combinations)} instances, {steps} steps in {elapsed:.2f} s,"
+        f" {int(computer.halted.sum())} halted"
+    )
@@ -0,0 +1,24 @@
+from hack_emulator import BlockComputer, Computer
+from hack_emulator.computer import find_halt_jumps
+
+# A=-1, M=0: RAM is addressed by the low 15 bits of A
+NEGATIVE_ADDRESS_ROM = [0b1110111010100000, 0b1110101010001000]
+
+
+def test_address_uses_low_15_bits():
+    for engine in (Computer, BlockComputer):
+        computer = engine(NEGATIVE_ADDRESS_ROM)
+        computer.poke(0x7FFF, 5)
+        computer.run(10)
+        assert computer.peek(0x7FFF) == 0
+        assert computer.a == 0xFFFF
+
+
+def test_only_loops_without_side_effects_halt():
+    # 0: (L) @0 M=M+1 @L 0;JMP    4: (END) @END 0;JMP
+    words = [0, 0b1111110111001000, 0, 0b1110101010000111, 4, 0b1110101010000111]
+    assert find_halt_jumps(words) == {5}
+    computer = Computer(words)
+    computer.run(100)
+    assert not computer.halted
+    assert computer.peek(0) == 25
@@ -0,0 +1,12 @@
+from hack_emulator.keyboard import key_name, parse_key, parse_script
+
+
+def test_key_names_round_trip():
+    for code in range(32768):
+        assert parse_key(key_name(code)) == code
+
+
+def test_unprintable_codes_are_not_digits():
+    assert key_name(9) == "#9"
+    assert parse_key("9") == ord("9")
+    assert parse_script(["0 #9", "10 9", "20 NONE"]) == [(0, 9), (10, ord("9")), (20, 0)]
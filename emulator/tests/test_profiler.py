@@ -0,0 +1,52 @@
+import pathlib
+import sys
+
+from hack_emulator.profiler import ProfilingComputer, SourceIndex, fold_commands, fold_functions
+
+ROOT = pathlib.Path(__file__).parents[2]
+
+# the compact build comes from the translator and the assembler
+sys.path[:0] = [str(ROOT / "vm_translator"), str(ROOT / "assembler")]
+
+from code_writer import END_LINES, CodeWriter  # noqa: E402
+from hack_assembler.assembler import assemble  # noqa: E402
+from hack_assembler.parser import decode_lines  # noqa: E402
+from hack_assembler.source_map import build_source_map  # noqa: E402
+
+
+def compact_build():
+    code_writer = CodeWriter(compact=True)
+    code_writer.write_init()
+    code_writer.file_name = "Sys"
+    code_writer.write_function("Sys.init", 0)
+    code_writer.write_call("Main.less", 0)
+    code_writer.write_label("LOOP")
+    code_writer.write_goto("LOOP")
+    code_writer.file_name = "Main"
+    code_writer.write_function("Main.less", 0)
+    code_writer.write_push_pop("push", "constant", 1)
+    code_writer.write_push_pop("push", "constant", 2)
+    code_writer.write_arithmetic("lt")
+    code_writer.write_return()
+    code_writer.output_lines.extend(END_LINES)
+    code_writer.write_shared_routines()
+    return "".join(code_writer.output_lines).splitlines()
+
+
+def test_shared_routines_are_their_own_functions():
+    lines = compact_build()
+    source_map = build_source_map(lines, decode_lines(lines))
+    markers = [source_map.marker(address) for address in range(len(source_map))]
+    index = SourceIndex.from_lines(lines, (source_map.line_numbers, markers))
+
+    computer = ProfilingComputer(assemble(lines))
+    computer.run(10_000)
+    assert computer.halted
+    counts = computer.address_counts()
+
+    functions = fold_functions(counts, index)
+    for routine in ("$CALL", "$RETURN", "$LT"):
+        assert functions[routine] > 0
+    assert sum(functions.values()) == computer.cycles
+    commands = fold_commands(counts, index)
+    assert "($CALL)" not in commands and "($RETURN)" not in commands
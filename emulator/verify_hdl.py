@@ -0,0 +1,63 @@
+import argparse
+import functools
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from hack_hdl.verify import verify_chip
+
+
+def expand_inputs(inputs: List[str]) -> List[pathlib.Path]:
+    paths: List[pathlib.Path] = []
+    for name in inputs:
+        path = pathlib.Path(name)
+        if path.is_dir():
+            paths.extend(sorted(path.rglob("*.hdl")))
+        else:
+            paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Check combinational HDL chips against reference models on every input"
+    )
+    arg_parser.add_argument("inputs", nargs="+", help=".hdl files or directories")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    arg_parser.add_argument(
+        "--exhaustive-bits",
+        type=int,
+        default=20,
+        help="test every input combination of chips with at most this many input bits",
+    )
+    arg_parser.add_argument(
+        "--samples", type=int, default=100000, help="random test vectors for wider chips"
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    hdl_paths = expand_inputs(args.inputs)
+    start = time.perf_counter()
+    verify = functools.partial(
+        verify_chip, exhaustive_bits=args.exhaustive_bits, samples=args.samples, seed=args.seed
+    )
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        results = list(executor.map(verify, hdl_paths))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for result in results:
+        if result.skipped is not None:
+            print(f"SKIP {result.hdl_path}: {result.skipped}")
+        elif result.passed:
+            kind = "exhaustive" if result.exhaustive else "random"
+            print(f"PASS {result.hdl_path}: {result.vectors} vectors ({kind})")
+        else:
+            failed += 1
+            print(f"FAIL {result.hdl_path}: {result.mismatch or result.error}")
+
+    print(f"{len(results)} chips, {failed} failed in {elapsed:.2f} s")
+    if failed:
+        sys.exit(1)
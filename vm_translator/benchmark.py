@@ -0,0 +1,123 @@
+import argparse
+import pathlib
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from main import VMTranslator
+from optimizer import RULES
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+# the benchmark assembles the translated programs and runs them
+sys.path[:0] = [str(ROOT / "assembler"), str(ROOT / "emulator")]
+
+from hack_assembler.assembler import assemble, collect_labels  # noqa: E402
+from hack_emulator.profiler import ProfilingComputer  # noqa: E402
+
+ROM_SIZE = 32768
+
+# 0;JMP encoded
+UNCONDITIONAL_JUMP = 0b1110101010000111
+
+# program -> (directory, whether it needs the OS classes of ch12)
+PROGRAMS: Dict[str, Tuple[pathlib.Path, bool]] = {
+    "FibonacciElement": (ROOT / "ch08" / "FunctionCalls" / "FibonacciElement", False),
+    "NestedCall": (ROOT / "ch08" / "FunctionCalls" / "NestedCall", False),
+    "StaticsTest": (ROOT / "ch08" / "FunctionCalls" / "StaticsTest", False),
+    "MathTest": (ROOT / "ch12" / "MathTest", True),
+    "Pong": (ROOT / "ch11" / "Pong", True),
+}
+
+# mode -> VMTranslator options
+MODES: Dict[str, Dict[str, Any]] = {
+    "inline": {},
+    "compact": {"compact": True},
+    "cached": {"cache_top": True},
+    "compact+cached": {"compact": True, "cache_top": True},
+}
+
+
+# one compiled .vm file per OS class, taken from the ch12 test directories
+def os_files() -> Dict[str, pathlib.Path]:
+    files: Dict[str, pathlib.Path] = {}
+    for vm_path in sorted((ROOT / "ch12").glob("*Test/*.vm")):
+        if vm_path.stem != "Main":
+            files.setdefault(vm_path.stem, vm_path)
+    return files
+
+
+def program_files(directory: pathlib.Path, with_os: bool) -> List[pathlib.Path]:
+    files = {vm_path.stem: vm_path for vm_path in directory.glob("*.vm")}
+    if with_os:
+        for name, vm_path in os_files().items():
+            files.setdefault(name, vm_path)
+    return [files[name] for name in sorted(files)]
+
+
+def translate(vm_files: List[pathlib.Path], options: Dict[str, Any]) -> List[str]:
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        for vm_path in vm_files:
+            shutil.copy(vm_path, directory)
+        vm_translator = VMTranslator(**options)
+        vm_translator.target_path = directory
+        vm_translator.generate_code()
+        vm_translator.close()
+        with open(vm_translator.output_path, "r") as f:
+            return f.read().splitlines()
+
+
+# Runs the program until it calls Sys.halt, whose entry is replaced by an
+# idle loop the emulator stops at, or for max_cycles. Returns the cycles, the
+# RAM reads and writes, and whether the program halted.
+def run(words, lines: List[str], max_cycles: int) -> Tuple[int, int, bool]:
+    halt_address: Optional[int] = collect_labels(lines).get("Sys.halt")
+    if halt_address is not None:
+        words[halt_address] = halt_address
+        words[halt_address + 1] = UNCONDITIONAL_JUMP
+    computer = ProfilingComputer(words)
+    computer.run(max_cycles)
+    accesses = 0
+    for (comp, operand, dest, _), count in zip(computer.program, computer.address_counts()):
+        if comp is not None:
+            accesses += count * ((1 if operand else 0) + (dest & 1))
+    return computer.cycles, accesses, computer.halted
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compare ROM size, cycles and RAM traffic of the translation modes"
+    )
+    arg_parser.add_argument(
+        "programs", nargs="*", choices=[[], *PROGRAMS], help="programs to measure (default: all)"
+    )
+    # Pong waits for the keyboard and never halts
+    arg_parser.add_argument("--cycles", type=int, default=5_000_000, help="cycle limit per run")
+    arg_parser.add_argument(
+        "-O", "--optimize", action="store_true", help="also measure every mode with the VM optimizer"
+    )
+    args = arg_parser.parse_args()
+
+    modes = dict(MODES)
+    if args.optimize:
+        modes.update({f"{mode} -O": {**options, "optimize_rules": list(RULES)} for mode, options in MODES.items()})
+
+    print(f"{'program':<18}{'mode':<20}{'ROM words':>10}{'cycles':>12}{'RAM accesses':>14}")
+    for name in args.programs or PROGRAMS:
+        directory, with_os = PROGRAMS[name]
+        vm_files = program_files(directory, with_os)
+        for mode, options in modes.items():
+            lines = translate(vm_files, options)
+            words = assemble(lines)
+            if len(words) > ROM_SIZE:
+                # addresses past 32K wrap around, so it cannot run
+                cycles_shown = accesses_shown = "too big"
+            else:
+                cycles, accesses, halted = run(words, lines, args.cycles)
+                # programs that did not halt ran for the same number of cycles
+                cycles_shown = str(cycles) if halted else f">{cycles}"
+                accesses_shown = str(accesses) if halted else "-"
+            label = name if mode == "inline" else ""
+            print(f"{label:<18}{mode:<20}{len(words):>10}{cycles_shown:>12}{accesses_shown:>14}")
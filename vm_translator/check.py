@@ -0,0 +1,85 @@
+import argparse
+import pathlib
+import sys
+from typing import Dict, List, Optional, Union
+
+from benchmark import MODES, ROOT, translate
+from optimizer import RULES
+
+# importing benchmark put the assembler and the emulator on sys.path
+from hack_assembler.assembler import assemble
+from hack_emulator import Computer
+from hack_emulator.script import Chip, TestScript
+
+# cycle limit per program; every test program ends in the END loop well before
+MAX_CYCLES = 1_000_000
+
+
+# The translated program on the emulator. The scripts' tick counts were
+# sized for the reference translator, so the first read after the setup
+# runs the program to its END loop instead of counting ticks.
+class ProgramChip(Chip):
+
+    def __init__(self, words):
+        self.computer = Computer(words)
+        self.finished = False
+
+    @staticmethod
+    def address(name: str) -> int:
+        if not name.startswith("RAM["):
+            raise RuntimeError(f"Unsupported pin {name}")
+        return int(name[4:-1])
+
+    def set(self, name: str, value: int) -> None:
+        self.computer.poke(self.address(name), value)
+
+    def get(self, name: str) -> int:
+        if not self.finished:
+            self.computer.run(MAX_CYCLES)
+            self.finished = True
+        return self.computer.peek(self.address(name))
+
+
+def test_scripts() -> List[pathlib.Path]:
+    # the VME scripts step through the VM code itself
+    return [
+        script_path
+        for script_path in sorted(ROOT.glob("ch0[78]/*/*/*.tst"))
+        if not script_path.stem.endswith("VME")
+    ]
+
+
+def check_script(script_path: pathlib.Path, options: Dict[str, Union[bool, List[str]]]) -> tuple:
+    words = assemble(translate(sorted(script_path.parent.glob("*.vm")), options))
+    result = TestScript(script_path, lambda _: ProgramChip(words)).run()
+    return result, len(words)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Run the ch07/ch08 test scripts on every translation mode, with and without the optimizer"
+    )
+    arg_parser.add_argument(
+        "--rules",
+        default=",".join(RULES),
+        help=f"comma-separated optimizer rules (default: {','.join(RULES)})",
+    )
+    args = arg_parser.parse_args()
+    rules = [name for name in args.rules.split(",") if name]
+
+    failed = 0
+    optimizer_settings: Dict[str, Optional[List[str]]] = {"": None, "+O": rules}
+    for script_path in test_scripts():
+        for mode, options in MODES.items():
+            for suffix, optimize_rules in optimizer_settings.items():
+                result, words = check_script(script_path, {**options, "optimize_rules": optimize_rules})
+                label = f"{script_path.stem} {mode}{suffix}"
+                if result.passed:
+                    print(f"PASS {label}: {words} words")
+                else:
+                    failed += 1
+                    print(f"FAIL {label}: {result.mismatch or result.error}")
+
+    print(f"{failed} failed")
+    if failed:
+        sys.exit(1)
@@ -1,7 +1,165 @@
 import textwrap
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
-END_LINES = ["(END)\n", "@END\n", "0;JMP"]
+END_LINES = ["(END)\n", "@END\n", "0;JMP\n"]
+
+# VM keyword of the commands whose arguments don't already include it
+MARKER_KEYWORDS = {
+    "write_label": "label",
+    "write_goto": "goto",
+    "write_if": "if-goto",
+    "write_function": "function",
+    "write_call": "call",
+    "write_return": "return",
+    "write_move": "move",
+    "write_arithmetic_constant": "constant",
+    "write_if_not": "if-not-goto",
+    "write_if_compare": "if-compare",
+}
+
+
+# jump of the shared compare routine of each comparison command
+COMPARE_JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+
+
+def _compare_routine(command: str) -> str:
+    routine = f"${command.upper()}"
+    return textwrap.dedent(
+        f"""
+        ({routine})
+        @R15
+        M=D
+        @SP
+        AM=M-1
+        D=M
+        A=A-1
+        D=M-D
+        M=-1
+        @{routine}_TRUE
+        D;{COMPARE_JUMPS[command]}
+        @SP
+        A=M-1
+        M=0
+        ({routine}_TRUE)
+        @R15
+        A=M
+        0;JMP
+        """
+    )
+
+
+# Routines of compact mode, emitted once after the program. All of them take
+# their return address in D.
+SHARED_ROUTINES: Dict[str, str] = {
+    # push the return address and the caller's frame, ARG = SP - 5 - R13,
+    # LCL = SP, jump to R14
+    "$CALL": textwrap.dedent(
+        """
+        ($CALL)
+        @SP
+        A=M
+        M=D
+        @LCL
+        D=M
+        @SP
+        AM=M+1
+        M=D
+        @ARG
+        D=M
+        @SP
+        AM=M+1
+        M=D
+        @THIS
+        D=M
+        @SP
+        AM=M+1
+        M=D
+        @THAT
+        D=M
+        @SP
+        AM=M+1
+        M=D
+        @SP
+        MD=M+1
+        @LCL
+        M=D
+        @R13
+        D=D-M
+        @5
+        D=D-A
+        @ARG
+        M=D
+        @R14
+        A=M
+        0;JMP
+        """
+    ),
+    # the return address is read before *ARG = pop() may overwrite it; LCL
+    # walks down the saved frame and is restored last
+    "$RETURN": textwrap.dedent(
+        """
+        ($RETURN)
+        @5
+        D=A
+        @LCL
+        A=M-D
+        D=M
+        @R14
+        M=D
+        @SP
+        AM=M-1
+        D=M
+        @ARG
+        A=M
+        M=D
+        D=A+1
+        @SP
+        M=D
+        @LCL
+        AM=M-1
+        D=M
+        @THAT
+        M=D
+        @LCL
+        AM=M-1
+        D=M
+        @THIS
+        M=D
+        @LCL
+        AM=M-1
+        D=M
+        @ARG
+        M=D
+        @LCL
+        A=M-1
+        D=M
+        @LCL
+        M=D
+        @R14
+        A=M
+        0;JMP
+        """
+    ),
+    **{f"${command.upper()}": _compare_routine(command) for command in COMPARE_JUMPS},
+}
+
+
+PREDEFINED_SEGMENTS = {
+    "argument": "ARG",
+    "local": "LCL",
+    "this": "THIS",
+    "that": "THAT",
+}
+
+FIXED_SEGMENTS = {"pointer": "3", "temp": "5"}
+
+# D=x op y with y in D and x in M, for top-of-stack caching
+CACHED_BINARY = {"add": "D=D+M", "sub": "D=M-D", "and": "D=D&M", "or": "D=D|M"}
+CACHED_UNARY = {"neg": "D=-D", "not": "D=!D"}
+
+# pops into a pointer segment address up to this far from the base walk
+# there with A=A+1 instead of going through R13/R14
+MAX_POINTER_STEPS = 6
 
 
 class CommandMarker:
@@ -10,7 +168,8 @@ class CommandMarker:
 
     def __get__(self, instance, owner):
         def wrapper(*args, **kwargs):
-            command_string = " ".join([str(x) for x in args])
+            keyword = MARKER_KEYWORDS.get(self.func.__name__)
+            command_string = " ".join(([keyword] if keyword else []) + [str(x) for x in args])
             if instance.debug_mode:
                 instance.output_lines.append(f"// start of [{command_string}]\n")
 
@@ -24,10 +183,21 @@ class CommandMarker:
 
 class CodeWriter:
 
-    def __init__(self):
+    def __init__(self, compact: bool = False, cache_top: bool = False):
         self.debug_mode: bool = True
+        # compact mode jumps to shared call, return and compare routines
+        # instead of inlining them at every command
+        self.compact = compact
+        self.used_routines: Set[str] = set()
+        # With cache_top the top of the stack stays in D across a straight
+        # run of commands; RAM[SP-1] is then the value below it. It is
+        # written back before labels, jumps, calls and returns.
+        self.cache_top = cache_top
+        self.top_in_d = False
         self.output_lines: List[str] = []
         self._file_name = ""
+        # generated labels are "<function or file>$<kind>.<index>", so files
+        # translated by separate writers never share one
         self.label_index = 0
         self._current_function_name: Optional[str] = None
 
@@ -39,26 +209,54 @@ class CodeWriter:
     def file_name(self, file_name: str):
         self._file_name = file_name
 
+    # code before the first function is named after its file
     @property
     def current_function_name(self) -> str:
-        return (
-            self._current_function_name
-            if self._current_function_name is not None
-            else "null"
-        )
+        if self._current_function_name is not None:
+            return self._current_function_name
+        return self._file_name or "null"
 
     # TODO : add function name validator
     @current_function_name.setter
     def current_function_name(self, value):
         self._current_function_name = value
 
+    # writes a top of stack cached in D back to the RAM stack
+    def spill_top(self):
+        if self.top_in_d:
+            asm_command = textwrap.dedent(
+                """
+                @SP
+                AM=M+1
+                A=A-1
+                M=D
+                """
+            )
+            self.output_lines.append(asm_command)
+            self.top_in_d = False
+
+    # D = top of stack, popping it from RAM unless it is cached
+    def load_top(self):
+        if not self.top_in_d:
+            asm_command = textwrap.dedent(
+                """
+                @SP
+                AM=M-1
+                D=M
+                """
+            )
+            self.output_lines.append(asm_command)
+            self.top_in_d = True
+
     @CommandMarker
     def write_label(self, label: str):
+        self.spill_top()
         label = f"{self.current_function_name}${label}"
         self.output_lines.append(f"({label})\n")
 
     @CommandMarker
     def write_goto(self, label: str):
+        self.spill_top()
         asm_command = textwrap.dedent(
             f"""
             @{self.current_function_name}${label}
@@ -69,6 +267,17 @@ class CodeWriter:
 
     @CommandMarker
     def write_if(self, label: str):
+        if self.cache_top:
+            self.load_top()
+            self.top_in_d = False
+            asm_command = textwrap.dedent(
+                f"""
+                @{self.current_function_name}${label}
+                D;JNE
+                """
+            )
+            self.output_lines.append(asm_command)
+            return
         asm_command = textwrap.dedent(
             f"""
             @SP
@@ -80,14 +289,54 @@ class CodeWriter:
         )
         self.output_lines.append(asm_command)
 
+    # SP = 256, call Sys.init
+    def write_init(self):
+        asm_command = textwrap.dedent(
+            """
+            @256
+            D=A
+            @SP
+            M=D
+            """
+        )
+        self.output_lines.append(asm_command)
+        self.write_call("Sys.init", 0)
+
+    def next_return_label(self, kind: str) -> str:
+        label = f"{self.current_function_name}${kind}.{self.label_index}"
+        self.label_index += 1
+        return label
+
     # TODO : Push 부분은 추상화한번 더 할 수 있음
     @CommandMarker
     def write_call(self, function_name: str, num_args: int):
-        function_name = f"{self.file_name}.{function_name}"
-        self.current_function_name = function_name
+        self.spill_top()
+        return_label = self.next_return_label("ret")
+        if self.compact:
+            # $CALL takes the return address in D, nArgs in R13, the callee in R14
+            self.used_routines.add("$CALL")
+            asm_command = textwrap.dedent(
+                f"""
+                @{num_args}
+                D=A
+                @R13
+                M=D
+                @{function_name}
+                D=A
+                @R14
+                M=D
+                @{return_label}
+                D=A
+                @$CALL
+                0;JMP
+                ({return_label})
+                """
+            )
+            self.output_lines.append(asm_command)
+            return
         asm_command = textwrap.dedent(
             f"""
-            @{function_name}$return-address
+            @{return_label}
             D=A
             @SP
             A=M
@@ -141,19 +390,25 @@ class CodeWriter:
             M=D
             @{function_name}
             0;JMP
-            ({function_name}$return-address)
+            ({return_label})
             """
         )
         self.output_lines.append(asm_command)
 
     @CommandMarker
     def write_return(self):
+        self.spill_top()
+        if self.compact:
+            self.used_routines.add("$RETURN")
+            self.output_lines.append("@$RETURN\n0;JMP\n")
+            return
         asm_command = textwrap.dedent(
             f"""
             // FRAME=LCL
             @LCL
             D=M
-            @FRAME // temp 0
+            // temp 0
+            @FRAME
             M=D
             //RET = *(FRAME-5)
             @5
@@ -221,7 +476,8 @@ class CodeWriter:
 
     @CommandMarker
     def write_function(self, function_name: str, num_locals: int):
-        function_name = f"{self.file_name}.{function_name}"
+        self.spill_top()
+        self.current_function_name = function_name
         asm_command = textwrap.dedent(
             f"""
             ({function_name})
@@ -243,10 +499,38 @@ class CodeWriter:
         )
         self.output_lines.append(asm_command)
 
+    # the routines compact mode jumped to, placed after the program's end loop;
+    # each is marked as a function of its own so profiles charge it there
+    # rather than to the last function of the program
+    def write_shared_routines(self):
+        for routine in sorted(self.used_routines):
+            if self.debug_mode:
+                self.output_lines.append(f"// start of [function {routine}]\n")
+            self.output_lines.append(SHARED_ROUTINES[routine])
+            if self.debug_mode:
+                self.output_lines.append(f"// end of [function {routine}]\n")
+
     @CommandMarker
     def write_arithmetic(self, command: str):
         asm_command = ""
-        if command == "add":
+        if self.compact and command in COMPARE_JUMPS:
+            # the shared routines work on the RAM stack
+            self.spill_top()
+            routine = f"${command.upper()}"
+            self.used_routines.add(routine)
+            return_label = self.next_return_label("cmp")
+            asm_command = textwrap.dedent(
+                f"""
+                @{return_label}
+                D=A
+                @{routine}
+                0;JMP
+                ({return_label})
+                """
+            )
+        elif self.cache_top:
+            self.write_cached_arithmetic(command)
+        elif command == "add":
             asm_command = textwrap.dedent(
                 """
                 @SP
@@ -285,23 +569,23 @@ class CodeWriter:
                 @SP
                 AM=M-1
                 D=M-D
-                @PUSHTRUE_{self.label_index}
+                @{self.current_function_name}$PUSHTRUE_{self.label_index}
                 D;JEQ
-                @PUSHFALSE_{self.label_index}
+                @{self.current_function_name}$PUSHFALSE_{self.label_index}
                 D;JNE
-                (PUSHTRUE_{self.label_index})
+                ({self.current_function_name}$PUSHTRUE_{self.label_index})
                 @SP
                 A=M
                 M=-1
-                @END_{self.label_index}
+                @{self.current_function_name}$END_{self.label_index}
                 0;JMP
-                (PUSHFALSE_{self.label_index})
+                ({self.current_function_name}$PUSHFALSE_{self.label_index})
                 @SP
                 A=M
                 M=0
-                @END_{self.label_index}
+                @{self.current_function_name}$END_{self.label_index}
                 0;JMP
-                (END_{self.label_index})
+                ({self.current_function_name}$END_{self.label_index})
                 @SP
                 M=M+1
                 """
@@ -316,23 +600,23 @@ class CodeWriter:
                 @SP
                 AM=M-1
                 D=M-D
-                @PUSHTRUE_{self.label_index}
+                @{self.current_function_name}$PUSHTRUE_{self.label_index}
                 D;JGT
-                @PUSHFALSE_{self.label_index}
+                @{self.current_function_name}$PUSHFALSE_{self.label_index}
                 D;JLE
-                (PUSHTRUE_{self.label_index})
+                ({self.current_function_name}$PUSHTRUE_{self.label_index})
                 @SP
                 A=M
                 M=-1
-                @END_{self.label_index}
+                @{self.current_function_name}$END_{self.label_index}
                 0;JMP
-                (PUSHFALSE_{self.label_index})
+                ({self.current_function_name}$PUSHFALSE_{self.label_index})
                 @SP
                 A=M
                 M=0
-                @END_{self.label_index}
+                @{self.current_function_name}$END_{self.label_index}
                 0;JMP
-                (END_{self.label_index})
+                ({self.current_function_name}$END_{self.label_index})
                 @SP
                 M=M+1
                 """
@@ -347,23 +631,23 @@ class CodeWriter:
                 @SP
                 AM=M-1
                 D=M-D
-                @PUSHTRUE_{self.label_index}
+                @{self.current_function_name}$PUSHTRUE_{self.label_index}
                 D;JLT
-                @PUSHFALSE_{self.label_index}
+                @{self.current_function_name}$PUSHFALSE_{self.label_index}
                 D;JGE
-                (PUSHTRUE_{self.label_index})
+                ({self.current_function_name}$PUSHTRUE_{self.label_index})
                 @SP
                 A=M
                 M=-1
-                @END_{self.label_index}
+                @{self.current_function_name}$END_{self.label_index}
                 0;JMP
-                (PUSHFALSE_{self.label_index})
+                ({self.current_function_name}$PUSHFALSE_{self.label_index})
                 @SP
                 A=M
                 M=0
-                @END_{self.label_index}
+                @{self.current_function_name}$END_{self.label_index}
                 0;JMP
-                (END_{self.label_index})
+                ({self.current_function_name}$END_{self.label_index})
                 @SP
                 M=M+1
                 """
@@ -405,14 +689,9 @@ class CodeWriter:
 
     @CommandMarker
     def write_push_pop(self, command: str, segment: str, index: int):
-        PREDEFINED_SEGMENTS = {
-            "argument": "ARG",
-            "local": "LCL",
-            "this": "THIS",
-            "that": "THAT ",
-        }
-
-        FIXED_SEGMENTS = {"pointer": "3", "temp": "5"}
+        if self.cache_top:
+            self.write_cached_push_pop(command, segment, index)
+            return
 
         asm_command = ""
         if command == "pop":
@@ -422,7 +701,7 @@ class CodeWriter:
                     @{PREDEFINED_SEGMENTS[segment]}
                     D=M
                     @{index}
-                    D=A+D
+                    D=D+A
                     @SP
                     AM=M-1
                     M=D+M
@@ -437,7 +716,7 @@ class CodeWriter:
                     @{FIXED_SEGMENTS[segment]}
                     D=A
                     @{index}
-                    D=A+D
+                    D=D+A
                     @SP
                     AM=M-1
                     M=D+M
@@ -478,7 +757,7 @@ class CodeWriter:
                     @{PREDEFINED_SEGMENTS[segment]}
                     D=M
                     @{index}
-                    D=A+D
+                    D=D+A
                     A=D
                     D=M
                     @SP
@@ -494,7 +773,7 @@ class CodeWriter:
                     @{FIXED_SEGMENTS[segment]}
                     D=A
                     @{index}
-                    D=A+D
+                    D=D+A
                     A=D
                     D=M
                     @SP
@@ -520,3 +799,172 @@ class CodeWriter:
         if asm_command != "":
             self.output_lines.append(asm_command)
 
+    # arithmetic on the top of stack in D, leaving the result there
+    def write_cached_arithmetic(self, command: str):
+        self.load_top()
+        if command in CACHED_BINARY:
+            asm_command = textwrap.dedent(
+                f"""
+                @SP
+                AM=M-1
+                {CACHED_BINARY[command]}
+                """
+            )
+        elif command in CACHED_UNARY:
+            asm_command = f"{CACHED_UNARY[command]}\n"
+        elif command in COMPARE_JUMPS:
+            asm_command = textwrap.dedent(
+                f"""
+                @SP
+                AM=M-1
+                D=M-D
+                @{self.current_function_name}$PUSHTRUE_{self.label_index}
+                D;{COMPARE_JUMPS[command]}
+                D=0
+                @{self.current_function_name}$END_{self.label_index}
+                0;JMP
+                ({self.current_function_name}$PUSHTRUE_{self.label_index})
+                D=-1
+                ({self.current_function_name}$END_{self.label_index})
+                """
+            )
+            self.label_index += 1
+        else:
+            return
+        self.output_lines.append(asm_command)
+
+    # asm leaving the value of a segment entry in D
+    def segment_load(self, segment: str, index: int) -> Optional[str]:
+        if segment == "constant":
+            return f"@{index}\nD=A\n"
+        if segment in PREDEFINED_SEGMENTS:
+            return textwrap.dedent(
+                f"""
+                @{PREDEFINED_SEGMENTS[segment]}
+                D=M
+                @{index}
+                A=D+A
+                D=M
+                """
+            )
+        if segment in FIXED_SEGMENTS:
+            return f"@{int(FIXED_SEGMENTS[segment]) + index}\nD=M\n"
+        if segment == "static":
+            return f"@{self._file_name}.{index}\nD=M\n"
+        return None
+
+    # asm storing D into a segment entry
+    def segment_store(self, segment: str, index: int) -> Optional[str]:
+        if segment in PREDEFINED_SEGMENTS and index <= MAX_POINTER_STEPS:
+            return textwrap.dedent(
+                f"""
+                @{PREDEFINED_SEGMENTS[segment]}
+                A=M
+                """
+            ) + "A=A+1\n" * index + "M=D\n"
+        if segment in PREDEFINED_SEGMENTS:
+            return textwrap.dedent(
+                f"""
+                @R13
+                M=D
+                @{PREDEFINED_SEGMENTS[segment]}
+                D=M
+                @{index}
+                D=D+A
+                @R14
+                M=D
+                @R13
+                D=M
+                @R14
+                A=M
+                M=D
+                """
+            )
+        if segment in FIXED_SEGMENTS:
+            return f"@{int(FIXED_SEGMENTS[segment]) + index}\nM=D\n"
+        if segment == "static":
+            return f"@{self._file_name}.{index}\nM=D\n"
+        return None
+
+    def write_cached_push_pop(self, command: str, segment: str, index: int):
+        if command == "push":
+            self.spill_top()
+            asm_command = self.segment_load(segment, index)
+            if asm_command is None:
+                return
+            self.output_lines.append(asm_command)
+            self.top_in_d = True
+            return
+
+        self.load_top()
+        asm_command = self.segment_store(segment, index)
+        if asm_command is None:
+            return
+        self.output_lines.append(asm_command)
+        self.top_in_d = False
+
+    # push S i / pop T j copied through D; the stack is left as it was
+    @CommandMarker
+    def write_move(self, src_segment: str, src_index: int, dst_segment: str, dst_index: int):
+        self.spill_top()
+        load = self.segment_load(src_segment, src_index)
+        store = self.segment_store(dst_segment, dst_index)
+        if load is not None and store is not None:
+            self.output_lines.append(load + store)
+
+    # push constant c / add or sub, without pushing c
+    @CommandMarker
+    def write_arithmetic_constant(self, command: str, value: int):
+        operator = "+" if command == "add" else "-"
+        # x op c with c in D and x in M
+        comp = "D+M" if command == "add" else "M-D"
+        if self.cache_top:
+            self.load_top()
+            if value == 1:
+                asm_command = f"D=D{operator}1\n"
+            else:
+                asm_command = f"@{value}\nD=D{operator}A\n"
+        elif value == 1:
+            asm_command = f"@SP\nA=M-1\nM=M{operator}1\n"
+        else:
+            asm_command = textwrap.dedent(
+                f"""
+                @{value}
+                D=A
+                @SP
+                A=M-1
+                M={comp}
+                """
+            )
+        self.output_lines.append(asm_command)
+
+    # not / if-goto: jumps unless the popped value is -1
+    @CommandMarker
+    def write_if_not(self, label: str):
+        if self.cache_top:
+            self.load_top()
+            self.top_in_d = False
+            asm_command = "D=D+1\n"
+        else:
+            asm_command = "@SP\nAM=M-1\nD=M+1\n"
+        asm_command += f"@{self.current_function_name}${label}\nD;JNE\n"
+        self.output_lines.append(asm_command)
+
+    # compare / if-goto: pops y and x and jumps on x - y
+    @CommandMarker
+    def write_if_compare(self, jump: str, label: str):
+        if self.cache_top:
+            self.load_top()
+            self.top_in_d = False
+        else:
+            self.output_lines.append("@SP\nAM=M-1\nD=M\n")
+        asm_command = textwrap.dedent(
+            f"""
+            @SP
+            AM=M-1
+            D=M-D
+            @{self.current_function_name}${label}
+            D;{jump}
+            """
+        )
+        self.output_lines.append(asm_command)
@@ -1,5 +1,6 @@
+from dataclasses import dataclass
 from enum import Enum
-from typing import List
+from typing import List, Tuple
 
 
 class CommandType(Enum):
@@ -12,6 +13,11 @@ class CommandType(Enum):
     C_FUNCTION = (7,)
     C_RETURN = (8,)
     C_CALL = 9
+    # fused commands produced by the optimizer, never parsed
+    C_MOVE = 10
+    C_ARITHMETIC_CONSTANT = 11
+    C_IF_NOT = 12
+    C_IF_COMPARE = 13
 
 
 class Parser:
@@ -72,3 +78,33 @@ class Parser:
             raise RuntimeError()
 
         return args[2]
+
+
+# One VM command with its arguments: (segment, index) for push and pop,
+# (name, count) for function and call, (label,) for flow commands and
+# (command,) for arithmetic.
+@dataclass(frozen=True)
+class VMCommand:
+    command_type: CommandType
+    args: Tuple = ()
+
+
+def parse_commands(lines: List[str]) -> List[VMCommand]:
+    parser = Parser(lines=lines)
+    commands: List[VMCommand] = []
+    while parser.has_more_commands:
+        parser.advance()
+        command_type = parser.command_type
+        if command_type in (
+            CommandType.C_PUSH,
+            CommandType.C_POP,
+            CommandType.C_FUNCTION,
+            CommandType.C_CALL,
+        ):
+            args = (parser.arg1, int(parser.arg2))
+        elif command_type == CommandType.C_RETURN:
+            args = ()
+        else:
+            args = (parser.arg1,)
+        commands.append(VMCommand(command_type, args))
+    return commands
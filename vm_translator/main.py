@@ -1,17 +1,64 @@
+import argparse
+import functools
 import pathlib
-import sys
-from typing import List, Optional
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
 
 from code_writer import END_LINES, CodeWriter
-from jack_parser import CommandType, Parser
+from jack_parser import CommandType, VMCommand, parse_commands
+from optimizer import RULES, VMOptimizer
 from util import preprocess_lines, read_file
 
 TARGET_SUFFIX = ".vm"
 
 
+# the assembly of one .vm file, translated by its own CodeWriter
+@dataclass
+class Fragment:
+    output_lines: List[str]
+    used_routines: Set[str]
+    matched: Counter = field(default_factory=Counter)
+    removed: Counter = field(default_factory=Counter)
+
+
+def translate_file(
+    path: pathlib.Path,
+    compact: bool = False,
+    cache_top: bool = False,
+    optimize_rules: Optional[List[str]] = None,
+) -> Fragment:
+    vm_translator = VMTranslator(compact=compact, cache_top=cache_top, optimize_rules=optimize_rules)
+    vm_translator._generate_asm_code(path)
+    code_writer = vm_translator.code_writer
+    # a fragment must not end with the top of the stack left in D
+    code_writer.spill_top()
+    optimizer = vm_translator.optimizer
+    if optimizer is None:
+        return Fragment(code_writer.output_lines, code_writer.used_routines)
+    return Fragment(code_writer.output_lines, code_writer.used_routines, optimizer.matched, optimizer.removed)
+
+
 class VMTranslator:
-    def __init__(self):
-        self.code_writer = CodeWriter()
+    def __init__(
+        self,
+        compact: bool = False,
+        cache_top: bool = False,
+        optimize_rules: Optional[List[str]] = None,
+        jobs: int = 1,
+    ):
+        self.code_writer = CodeWriter(compact=compact, cache_top=cache_top)
+        self.translate = functools.partial(
+            translate_file, compact=compact, cache_top=cache_top, optimize_rules=optimize_rules
+        )
+        # files are translated in this many worker processes when above 1
+        self.jobs = jobs
+        # VM commands are rewritten by the optimizer before translation
+        # when it is given a list of rules
+        self.optimizer: Optional[VMOptimizer] = (
+            VMOptimizer(optimize_rules) if optimize_rules is not None else None
+        )
         self._target_path: Optional[pathlib.Path] = None
         self._target_files: List[pathlib.Path] = []
         self.output_path: Optional[pathlib.Path] = None
@@ -27,7 +74,8 @@ class VMTranslator:
             self.output_path = path.with_suffix(".asm")
         elif path.is_dir():
             self.output_path = path / f"{path.name}.asm"
-            for file_path in path.glob("*.vm"):
+            # sorted so the merged output does not depend on the file system
+            for file_path in sorted(path.glob("*.vm")):
                 self._target_files.append(file_path)
 
     def _generate_asm_code(self, path: pathlib.Path):
@@ -36,51 +84,106 @@ class VMTranslator:
         lines = read_file(path)
         lines = preprocess_lines(lines)
 
-        parser = Parser(lines=lines)
-
-        while True:
-            h = parser.has_more_commands
-            if h is False:
-                break
-            parser.advance()
-
-            command_type = parser.command_type
-
-            if command_type == CommandType.C_ARITHMETIC:
-                self.code_writer.write_arithmetic(parser.arg1)
-            elif command_type == CommandType.C_PUSH:
-                self.code_writer.write_push_pop("push", parser.arg1, int(parser.arg2))
-            elif command_type == CommandType.C_POP:
-                self.code_writer.write_push_pop("pop", parser.arg1, int(parser.arg2))
-            elif command_type == CommandType.C_LABEL:
-                self.code_writer.write_label(parser.arg1)
-            elif command_type == CommandType.C_GOTO:
-                self.code_writer.write_goto(parser.arg1)
-            elif command_type == CommandType.C_IF:
-                self.code_writer.write_if(parser.arg1)
-            elif command_type == CommandType.C_FUNCTION:
-                self.code_writer.write_function(parser.arg1, int(parser.arg2))
-            elif command_type == CommandType.C_CALL:
-                self.code_writer.write_call(parser.arg1, int(parser.arg2))
-            elif command_type == CommandType.C_RETURN:
-                self.code_writer.write_return()
+        commands = parse_commands(lines)
+        if self.optimizer is not None:
+            commands = self.optimizer.optimize(commands)
+        for command in commands:
+            self.write_command(command)
+
+    def write_command(self, command: VMCommand):
+        command_type = command.command_type
+        args = command.args
+
+        if command_type == CommandType.C_ARITHMETIC:
+            self.code_writer.write_arithmetic(*args)
+        elif command_type == CommandType.C_PUSH:
+            self.code_writer.write_push_pop("push", *args)
+        elif command_type == CommandType.C_POP:
+            self.code_writer.write_push_pop("pop", *args)
+        elif command_type == CommandType.C_LABEL:
+            self.code_writer.write_label(*args)
+        elif command_type == CommandType.C_GOTO:
+            self.code_writer.write_goto(*args)
+        elif command_type == CommandType.C_IF:
+            self.code_writer.write_if(*args)
+        elif command_type == CommandType.C_FUNCTION:
+            self.code_writer.write_function(*args)
+        elif command_type == CommandType.C_CALL:
+            self.code_writer.write_call(*args)
+        elif command_type == CommandType.C_RETURN:
+            self.code_writer.write_return()
+        elif command_type == CommandType.C_MOVE:
+            self.code_writer.write_move(*args)
+        elif command_type == CommandType.C_ARITHMETIC_CONSTANT:
+            self.code_writer.write_arithmetic_constant(*args)
+        elif command_type == CommandType.C_IF_NOT:
+            self.code_writer.write_if_not(*args)
+        elif command_type == CommandType.C_IF_COMPARE:
+            self.code_writer.write_if_compare(*args)
 
     def generate_code(self):
-        for target_file in self._target_files:
-            self._generate_asm_code(target_file)
+        # programs with a Sys.vm start at Sys.init; single files and test
+        # programs without one run from their first command
+        if any(target_file.name == "Sys.vm" for target_file in self._target_files):
+            self.code_writer.write_init()
+        # Every file gets a fresh CodeWriter, in this process or a worker;
+        # the fragments come back in file order either way.
+        if self.jobs > 1 and len(self._target_files) > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                fragments = list(executor.map(self.translate, self._target_files))
+        else:
+            fragments = [self.translate(target_file) for target_file in self._target_files]
+        for fragment in fragments:
+            self.code_writer.output_lines.extend(fragment.output_lines)
+            self.code_writer.used_routines |= fragment.used_routines
+            if self.optimizer is not None:
+                self.optimizer.matched += fragment.matched
+                self.optimizer.removed += fragment.removed
 
     def close(self):
+        self.code_writer.spill_top()
         self.code_writer.output_lines.extend(END_LINES)
+        self.code_writer.write_shared_routines()
         with open(self.output_path, "w") as f:
             f.writelines(self.code_writer.output_lines)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        raise ValueError("Missing required argument. Pass path to compile.")
-    target_path = pathlib.Path(sys.argv[1])
-
-    vm_translator = VMTranslator()
+    arg_parser = argparse.ArgumentParser(description="Translate VM code to Hack assembly")
+    arg_parser.add_argument("target_path", type=pathlib.Path, help=".vm file or directory")
+    arg_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="share one call, return and compare routine instead of inlining them",
+    )
+    arg_parser.add_argument(
+        "--cache-top",
+        action="store_true",
+        help="keep the top of the stack in D between commands",
+    )
+    arg_parser.add_argument(
+        "-O", "--optimize", action="store_true", help="rewrite VM command patterns before translating"
+    )
+    arg_parser.add_argument(
+        "--rules",
+        default=",".join(RULES),
+        help=f"comma-separated optimizer rules (default: {','.join(RULES)})",
+    )
+    arg_parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="translate the .vm files in this many processes"
+    )
+    args = arg_parser.parse_args()
+    target_path = args.target_path
+
+    optimize_rules = [name for name in args.rules.split(",") if name] if args.optimize else None
+    vm_translator = VMTranslator(
+        compact=args.compact,
+        cache_top=args.cache_top,
+        optimize_rules=optimize_rules,
+        jobs=args.jobs,
+    )
     vm_translator.target_path = target_path
     vm_translator.generate_code()
     vm_translator.close()
+    if vm_translator.optimizer is not None:
+        print(vm_translator.optimizer.report())
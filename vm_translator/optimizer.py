@@ -0,0 +1,212 @@
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from code_writer import COMPARE_JUMPS
+from jack_parser import CommandType, VMCommand
+
+# A rule looks at the window starting at index i and returns how many
+# commands it matched together with their replacement, or None.
+Rule = Callable[[List[VMCommand], int], Optional[Tuple[int, List[VMCommand]]]]
+
+# results of arithmetic on two constants, before truncating to 16 bits
+FOLDS: Dict[str, Callable[[int, int], int]] = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: -1 if x == y else 0,
+    "gt": lambda x, y: -1 if x > y else 0,
+    "lt": lambda x, y: -1 if x < y else 0,
+}
+
+# jump taken when the comparison is false
+NEGATED_JUMPS = {"JEQ": "JNE", "JGT": "JLE", "JLT": "JGE"}
+
+# push constant only takes 15-bit values
+MAX_CONSTANT = 0x7FFF
+
+
+def _is(command: VMCommand, command_type: CommandType, *args) -> bool:
+    return command.command_type == command_type and command.args[:len(args)] == args
+
+
+def _push_constant(value: int) -> List[VMCommand]:
+    value &= 0xFFFF
+    if value <= MAX_CONSTANT:
+        return [VMCommand(CommandType.C_PUSH, ("constant", value))]
+    if value == 0xFFFF:
+        return [
+            VMCommand(CommandType.C_PUSH, ("constant", 0)),
+            VMCommand(CommandType.C_ARITHMETIC, ("not",)),
+        ]
+    return []
+
+
+# push constant a / push constant b / add -> push constant a+b
+def constant_folding(commands: List[VMCommand], i: int):
+    window = commands[i:i + 3]
+    if (
+        len(window) == 3
+        and _is(window[0], CommandType.C_PUSH, "constant")
+        and _is(window[1], CommandType.C_PUSH, "constant")
+        and window[2].command_type == CommandType.C_ARITHMETIC
+        and window[2].args[0] in FOLDS
+    ):
+        folded = _push_constant(FOLDS[window[2].args[0]](window[0].args[1], window[1].args[1]))
+        if folded:
+            return 3, folded
+    return None
+
+
+# not / not -> nothing, neg / neg -> nothing
+def double_negation(commands: List[VMCommand], i: int):
+    window = commands[i:i + 2]
+    if (
+        len(window) == 2
+        and window[0].command_type == CommandType.C_ARITHMETIC
+        and window[0].args[0] in ("not", "neg")
+        and window[1] == window[0]
+    ):
+        return 2, []
+    return None
+
+
+# push constant 0 / add, sub or or -> nothing
+def identity(commands: List[VMCommand], i: int):
+    window = commands[i:i + 2]
+    if (
+        len(window) == 2
+        and _is(window[0], CommandType.C_PUSH, "constant", 0)
+        and window[1].command_type == CommandType.C_ARITHMETIC
+        and window[1].args[0] in ("add", "sub", "or")
+    ):
+        return 2, []
+    return None
+
+
+# push local 0 / pop local 0 -> nothing
+def self_move(commands: List[VMCommand], i: int):
+    window = commands[i:i + 2]
+    if (
+        len(window) == 2
+        and window[0].command_type == CommandType.C_PUSH
+        and window[1].command_type == CommandType.C_POP
+        and window[0].args == window[1].args
+    ):
+        return 2, []
+    return None
+
+
+# push argument 1 / pop static 0 -> move argument 1 static 0
+# the value goes through D without touching the stack
+def direct_move(commands: List[VMCommand], i: int):
+    window = commands[i:i + 2]
+    if (
+        len(window) == 2
+        and window[0].command_type == CommandType.C_PUSH
+        and window[1].command_type == CommandType.C_POP
+    ):
+        return 2, [VMCommand(CommandType.C_MOVE, window[0].args + window[1].args)]
+    return None
+
+
+# push constant 1 / add -> constant add 1
+def constant_arithmetic(commands: List[VMCommand], i: int):
+    window = commands[i:i + 2]
+    if (
+        len(window) == 2
+        and _is(window[0], CommandType.C_PUSH, "constant")
+        and window[1].command_type == CommandType.C_ARITHMETIC
+        and window[1].args[0] in ("add", "sub")
+    ):
+        return 2, [VMCommand(CommandType.C_ARITHMETIC_CONSTANT, (window[1].args[0], window[0].args[1]))]
+    return None
+
+
+# lt / not / if-goto L -> if-compare JGE L
+# the compare jumps on x - y directly instead of pushing -1 or 0 first
+def compare_branch(commands: List[VMCommand], i: int):
+    window = commands[i:i + 3]
+    if not (window[0].command_type == CommandType.C_ARITHMETIC and window[0].args[0] in COMPARE_JUMPS):
+        return None
+    jump = COMPARE_JUMPS[window[0].args[0]]
+    if len(window) >= 2 and window[1].command_type == CommandType.C_IF:
+        return 2, [VMCommand(CommandType.C_IF_COMPARE, (jump, *window[1].args))]
+    if (
+        len(window) == 3
+        and _is(window[1], CommandType.C_ARITHMETIC, "not")
+        and window[2].command_type == CommandType.C_IF
+    ):
+        return 3, [VMCommand(CommandType.C_IF_COMPARE, (NEGATED_JUMPS[jump], *window[2].args))]
+    return None
+
+
+# not / if-goto L -> if-not-goto L
+def negated_branch(commands: List[VMCommand], i: int):
+    window = commands[i:i + 2]
+    if (
+        len(window) == 2
+        and _is(window[0], CommandType.C_ARITHMETIC, "not")
+        and window[1].command_type == CommandType.C_IF
+    ):
+        return 2, [VMCommand(CommandType.C_IF_NOT, window[1].args)]
+    return None
+
+
+# earlier rules win when several match at the same command
+RULES: Dict[str, Rule] = {
+    "constant_folding": constant_folding,
+    "double_negation": double_negation,
+    "identity": identity,
+    "self_move": self_move,
+    "direct_move": direct_move,
+    "constant_arithmetic": constant_arithmetic,
+    "compare_branch": compare_branch,
+    "negated_branch": negated_branch,
+}
+
+
+class VMOptimizer:
+
+    def __init__(self, rules: Optional[Iterable[str]] = None):
+        names = list(RULES) if rules is None else list(rules)
+        for name in names:
+            if name not in RULES:
+                raise RuntimeError(f"Unknown optimizer rule: {name}")
+        self.rules: List[Tuple[str, Rule]] = [(name, RULES[name]) for name in names]
+        # matches and VM commands removed per rule
+        self.matched: Counter = Counter()
+        self.removed: Counter = Counter()
+
+    # rewrites until no rule matches anywhere; rules only match runs of
+    # adjacent commands, so nothing moves across a label
+    def optimize(self, commands: List[VMCommand]) -> List[VMCommand]:
+        changed = True
+        while changed:
+            changed = False
+            optimized: List[VMCommand] = []
+            i = 0
+            while i < len(commands):
+                for name, rule in self.rules:
+                    match = rule(commands, i)
+                    if match is not None:
+                        length, replacement = match
+                        optimized.extend(replacement)
+                        self.matched[name] += 1
+                        self.removed[name] += length - len(replacement)
+                        i += length
+                        changed = True
+                        break
+                else:
+                    optimized.append(commands[i])
+                    i += 1
+            commands = optimized
+        return commands
+
+    def report(self) -> str:
+        lines = [
+            f"{name:>20}: {self.matched[name]} matched, {self.removed[name]} commands removed"
+            for name, _ in self.rules
+        ]
+        lines.append(f"{'total':>20}: {sum(self.matched.values())} matched, {sum(self.removed.values())} commands removed")
+        return "\n".join(lines)
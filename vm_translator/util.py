@@ -4,7 +4,6 @@ from typing import List
 
 def read_file(file_name) -> List[str]:
     with open(file_name, 'r') as f:
-        f.readline()
         return f.readlines()
 
 